@@ -1,42 +1,223 @@
+'''
+Check that tutorial notebooks are committed without outputs / execution counts.
+
+Same rules as nb_clean.check_notebook(remove_empty_cells=False,
+preserve_cell_metadata=True), but
+    - notebooks are checked on a process pool
+    - notebooks whose content hash passed on a previous run are skipped
+      (hashes are kept in a local cache file)
+    - cells are checked while streaming through the JSON (ijson), so large
+      base64 outputs are never turned into nbformat objects
+    - a per-notebook timing report is printed at the end
+
+Notebooks excluded from execution in book/_config.yml are scrubbed (for
+spellcheck and linkcheck) unless they are already clean.
+
+usage (from the repository root):
+    python .github/workflows/ensure_clean_notebooks.py [--workers N] [--no-cache]
+'''
+import argparse
+import hashlib
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import nb_clean as nbc
-import nbformat
 import yaml
 
-with open('./book/_config.yml') as f:
-  data = yaml.safe_load(f)
+CACHE_FILE = '.ensure_clean_cache.json'
+# bump when the checks change, so old cache entries are ignored
+CACHE_VERSION = 1
+
+
+def iter_cells(raw):
+    '''
+    Yield (cell_type, execution_count, has_outputs, has_source) for each cell
+    of a notebook, from the raw bytes of the .ipynb.
+
+    ijson's C backend walks over the output blobs without building them into
+    Python objects; without it the plain json module is faster than ijson's
+    pure Python backend, so that is used instead.
+    '''
+    try:
+        import ijson
+        fast = ijson.backend in ('yajl2_c', 'yajl2_cffi')
+    except ImportError:
+        fast = False
+
+    if not fast:
+        for cell in json.loads(raw).get('cells', []):
+            source = cell.get('source', '')
+            yield (cell.get('cell_type'), cell.get('execution_count'),
+                   bool(cell.get('outputs')), bool(''.join(source)))
+        return
+
+    cell = None
+    for prefix, event, value in ijson.parse(raw):
+        if not prefix.startswith('cells.item'):
+            continue
+        if prefix == 'cells.item':
+            if event == 'start_map':
+                cell = {'cell_type': None, 'execution_count': None,
+                        'outputs': False, 'source': False}
+            elif event == 'end_map':
+                yield (cell['cell_type'], cell['execution_count'],
+                       cell['outputs'], cell['source'])
+        elif prefix == 'cells.item.cell_type':
+            cell['cell_type'] = value
+        elif prefix == 'cells.item.execution_count':
+            cell['execution_count'] = value
+        elif prefix.startswith('cells.item.outputs.item'):
+            cell['outputs'] = True
+        elif prefix in ('cells.item.source', 'cells.item.source.item') and event == 'string':
+            # nbformat joins multi-line sources, so [''] counts as empty too
+            cell['source'] = cell['source'] or bool(value)
 
-# Sometimes we use rendered notebooks instead of executing them
-exclude_paths = []
-for pattern in data['execute']['exclude_patterns']:
-    exclude_paths += list(Path('book/tutorials').glob(pattern))
-    exclude_notebooks = [path.as_posix() for path in exclude_paths]
-print('Excluded from execution:\n', '\n'.join(exclude_notebooks))
 
-# Scrub outputs for spellcheck and linkcheck
-for notebook in exclude_notebooks:
-    print(f'Scrubbing outputs: {notebook}...')
+def check_notebook(raw, filename):
+    '''
+    Return (is_clean, has_empty_cells, nb_clean style messages).
+    '''
+    is_clean = True
+    has_empty = False
+    messages = []
+    for index, (cell_type, execution_count, has_outputs, has_source) in enumerate(iter_cells(raw)):
+        prefix = f'{filename} cell {index}'
+        has_empty = has_empty or not has_source
+        if cell_type == 'code':
+            if execution_count:
+                messages.append(f'{prefix}: execution count')
+                is_clean = False
+            if has_outputs:
+                messages.append(f'{prefix}: outputs')
+                is_clean = False
+    return is_clean, has_empty, messages
+
+
+def scrub_notebook(notebook):
+    '''
+    Remove outputs, execution counts and empty cells in place (with nb_clean).
+    '''
+    import nb_clean as nbc
+    import nbformat
+
     nb = nbformat.read(notebook, as_version=nbformat.NO_CONVERT)
     cleaned = nbc.clean_notebook(nb,
                                  remove_empty_cells=True,
                                  preserve_cell_metadata=True)
     nbformat.write(cleaned, notebook)
+    return Path(notebook).read_bytes()
 
 
-all_ipynbs = [path.as_posix() for path in Path('book/tutorials').rglob('*.ipynb')]
-ipynbs = [p for p in all_ipynbs if not '.ipynb_checkpoints' in p]
+def process_notebook(notebook, scrub, known_hash):
+    '''
+    Check (or, for excluded notebooks, scrub) one notebook.
+
+    Returns a dictionary with the notebook, its status (cached / clean /
+    scrubbed / dirty), the content hash after the run, messages and timing.
+    '''
+    t0 = time.perf_counter()
+    raw = Path(notebook).read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    result = {'notebook': notebook, 'bytes': len(raw), 'hash': digest, 'messages': []}
+
+    if digest == known_hash:
+        result['status'] = 'cached'
+    else:
+        is_clean, has_empty, messages = check_notebook(raw, notebook)
+        if scrub and (not is_clean or has_empty):
+            raw = scrub_notebook(notebook)
+            result['hash'] = hashlib.sha256(raw).hexdigest()
+            result['status'] = 'scrubbed'
+        elif is_clean:
+            result['status'] = 'clean'
+        else:
+            result['status'] = 'dirty'
+            result['messages'] = messages
+    result['seconds'] = time.perf_counter() - t0
+    return result
+
+
+def excluded_notebooks(config='./book/_config.yml', root='book/tutorials'):
+    '''
+    Notebooks matching execute: exclude_patterns in the Jupyter Book config.
+    '''
+    with open(config) as f:
+        data = yaml.safe_load(f)
+
+    # Sometimes we use rendered notebooks instead of executing them
+    patterns = (data.get('execute') or {}).get('exclude_patterns') or []
+    exclude_paths = []
+    for pattern in patterns:
+        exclude_paths += list(Path(root).glob(pattern))
+    return sorted({path.as_posix() for path in exclude_paths})
+
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('notebooks', {})
+
+
+def save_cache(path, notebooks):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'notebooks': notebooks}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: number of CPUs)')
+    parser.add_argument('--cache', default=CACHE_FILE, help='hash cache file')
+    parser.add_argument('--no-cache', action='store_true', help='check every notebook')
+    args = parser.parse_args()
+
+    exclude_notebooks = excluded_notebooks()
+    print('Excluded from execution:\n', '\n'.join(exclude_notebooks))
+
+    all_ipynbs = [path.as_posix() for path in Path('book/tutorials').rglob('*.ipynb')]
+    ipynbs = sorted(p for p in all_ipynbs if not '.ipynb_checkpoints' in p)
+
+    cache = {} if args.no_cache else load_cache(args.cache)
+    excluded = set(exclude_notebooks)
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(process_notebook, ipynbs,
+                                [nb in excluded for nb in ipynbs],
+                                [cache.get(nb) for nb in ipynbs]))
+    elapsed = time.perf_counter() - t0
+
+    for result in results:
+        for message in result['messages']:
+            print(message)
+
+    print(f'\n{"seconds":>8} {"MiB":>8}  status    notebook')
+    for result in sorted(results, key=lambda r: r['seconds'], reverse=True):
+        print(f"{result['seconds']:8.3f} {result['bytes'] / 2**20:8.2f}  "
+              f"{result['status']:<9} {result['notebook']}")
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    print(f'{len(results)} notebooks in {elapsed:.2f} s: '
+          + ', '.join(f'{n} {status}' for status, n in sorted(counts.items())))
+
+    if not args.no_cache:
+        # only clean notebooks are remembered, so dirty ones are checked again next time
+        save_cache(args.cache, {r['notebook']: r['hash'] for r in results if r['status'] != 'dirty'})
+
+    if any(r['status'] == 'dirty' for r in results):
+        sys.exit(1)
 
-results = []
-for notebook in ipynbs:
-    #if not notebook in exclude_notebooks:
-    print(f'Checking {notebook}...')
-    nb = nbformat.read(notebook, as_version=nbformat.NO_CONVERT)
-    result = nbc.check_notebook(nb,
-                                remove_empty_cells=False,
-                                preserve_cell_metadata=True)
-    results.append(result)
 
-if False in results:
-    sys.exit(1)
+if __name__ == '__main__':
+    main()
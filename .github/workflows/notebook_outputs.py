@@ -0,0 +1,308 @@
+'''
+Report and shrink the rendered outputs stored in tutorial notebooks.
+
+Notebooks are streamed one cell at a time (ijson), so a notebook with
+hundreds of MB of embedded images is never loaded as a whole.
+
+commands
+    report       bytes per cell and per output MIME type
+    strip        remove output data above --threshold bytes
+    externalize  move output data above --threshold bytes into content-addressed
+                 files (<store>/<sha256[:2]>/<sha256>.<ext>) and leave a
+                 text/plain placeholder that points to the file
+    restore      put externalized output data back into the notebooks
+
+usage (from the repository root):
+    python .github/workflows/notebook_outputs.py report
+    python .github/workflows/notebook_outputs.py externalize --threshold 200000 book/tutorials/albedo/*.ipynb
+'''
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import textwrap
+from pathlib import Path
+
+STORE = 'book/_build/notebook_outputs'
+THRESHOLD = 100 * 1024
+# stored base64 encoded in the notebook, decoded in the store
+BINARY = {'image/png': '.png', 'image/jpeg': '.jpg', 'image/gif': '.gif', 'application/pdf': '.pdf'}
+EXTENSIONS = {'text/html': '.html', 'text/plain': '.txt', 'text/markdown': '.md',
+              'text/latex': '.tex', 'image/svg+xml': '.svg', 'application/json': '.json',
+              'application/javascript': '.js'}
+PLACEHOLDER = re.compile(r'\[\S+ output of \d+ bytes (removed|moved to \S+)\]')
+
+
+def stream_notebook(path, rest):
+    '''
+    Yield the cells of a notebook one at a time.
+
+    Everything but the cells (metadata, nbformat, ...) is put into the
+    dictionary `rest` once the generator is exhausted. Without ijson the
+    notebook is loaded with the json module instead.
+    '''
+    try:
+        import ijson
+        from ijson.common import ObjectBuilder
+    except ImportError:
+        with open(path, encoding='utf-8') as f:
+            nb = json.load(f)
+        yield from nb.pop('cells', [])
+        rest.update(nb)
+        return
+
+    top = ObjectBuilder()
+    cell = None
+    with open(path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix == 'cells.item' and event == 'start_map':
+                cell = ObjectBuilder()
+            if cell is None:
+                top.event(event, value)
+                continue
+            cell.event(event, value)
+            if prefix == 'cells.item' and event == 'end_map':
+                yield cell.value
+                cell = None
+    top.value.pop('cells', None)
+    rest.update(top.value)
+
+
+def write_notebook(path, cells, rest):
+    '''
+    Write a notebook cell by cell, in nbformat's layout (indent=1, sorted keys).
+    '''
+    def dump(value, indent):
+        text = json.dumps(value, indent=1, sort_keys=True, ensure_ascii=False)
+        # JSON strings never contain raw newlines, so every line gets indented
+        return textwrap.indent(text, ' ' * indent).lstrip(' ')
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write('{\n "cells": [')
+        n = 0
+        for cell in cells:
+            f.write((',' if n else '') + '\n  ' + dump(cell, 2))
+            n += 1
+        f.write('\n ]' if n else ']')
+        for key in sorted(rest):
+            f.write(f',\n {json.dumps(key)}: {dump(rest[key], 1)}')
+        f.write('\n}\n')
+    os.replace(tmp, path)
+
+
+def _nbytes(value):
+    '''
+    Approximate stored size of an output value (string or list of lines).
+    '''
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, list):
+        return sum(_nbytes(v) for v in value)
+    return len(json.dumps(value).encode('utf-8'))
+
+
+def _output_items(output):
+    '''
+    Yield (container, key, mime) for the sizeable parts of one output.
+    '''
+    if output.get('output_type') == 'stream':
+        yield output, 'text', 'stream/' + output.get('name', 'stdout')
+    elif output.get('output_type') == 'error':
+        yield output, 'traceback', 'error/traceback'
+    else:
+        for mime in list(output.get('data', {})):
+            yield output['data'], mime, mime
+
+
+def report(notebooks, top=20):
+    '''
+    Print bytes per output MIME type and the largest cells of the notebooks.
+    '''
+    per_mime = {}
+    cells = []
+    for notebook in notebooks:
+        file_bytes = os.path.getsize(notebook)
+        output_bytes = 0
+        for index, cell in enumerate(stream_notebook(notebook, {})):
+            cell_bytes = 0
+            for output in cell.get('outputs', []):
+                for container, key, mime in _output_items(output):
+                    n = _nbytes(container[key])
+                    count, total = per_mime.get(mime, (0, 0))
+                    per_mime[mime] = (count + 1, total + n)
+                    cell_bytes += n
+            if cell_bytes:
+                cells.append((cell_bytes, notebook, index))
+            output_bytes += cell_bytes
+        print(f'{file_bytes / 2**20:9.2f} MiB file, {output_bytes / 2**20:9.2f} MiB outputs  {notebook}')
+
+    print(f'\n{"outputs":>8} {"MiB":>10}  MIME type')
+    for mime, (count, total) in sorted(per_mime.items(), key=lambda kv: kv[1][1], reverse=True):
+        print(f'{count:8d} {total / 2**20:10.3f}  {mime}')
+
+    print(f'\nlargest {min(top, len(cells))} cells:')
+    for cell_bytes, notebook, index in sorted(cells, reverse=True)[:top]:
+        print(f'{cell_bytes / 2**20:10.3f} MiB  {notebook} cell {index}')
+
+
+def _externalize(value, mime, store):
+    '''
+    Write one output value to the content-addressed store.
+
+    Returns the path and how the value was stored (the keys of the metadata
+    entry restore needs to rebuild the exact original value):
+        binary  base64 decoded, with trailing_newline
+        string  a single string
+        lines   a list of lines, joined
+        json    anything else (e.g. tracebacks, lines without newlines), as JSON
+    '''
+    if mime in BINARY and isinstance(value, str):
+        data = base64.b64decode(value)
+        trailing_newline = value.endswith('\n')
+        if base64.b64encode(data).decode('ascii') + '\n' * trailing_newline == value:
+            info = {'format': 'binary', 'trailing_newline': trailing_newline}
+            ext = BINARY[mime]
+        else: # wrapped / non-canonical base64 does not round-trip through bytes
+            data = None
+    else:
+        data = None
+
+    if data is None:
+        ext = EXTENSIONS.get(mime, '.txt')
+        if isinstance(value, str):
+            info = {'format': 'string'}
+            data = value.encode('utf-8')
+        elif (isinstance(value, list) and all(isinstance(v, str) for v in value)
+              and ''.join(value).splitlines(keepends=True) == value):
+            info = {'format': 'lines'}
+            data = ''.join(value).encode('utf-8')
+        else:
+            info = {'format': 'json'}
+            data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+            ext = '.json'
+    digest = hashlib.sha256(data).hexdigest()
+    path = Path(store) / digest[:2] / (digest + ext)
+    if not path.exists(): # same content, same file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    return path, info
+
+
+def shrink_cells(cells, threshold, store=None, stats=None):
+    '''
+    Strip (store=None) or externalize output values larger than threshold bytes.
+
+    Externalized values are listed in the cell metadata (outputs themselves
+    may not carry extra keys in nbformat 4), so restore can find them.
+    '''
+    for cell in cells:
+        for index, output in enumerate(cell.get('outputs', [])):
+            for container, key, mime in list(_output_items(output)):
+                n = _nbytes(container[key])
+                if n <= threshold or PLACEHOLDER.fullmatch(''.join(container[key])):
+                    continue
+                stats['bytes'] += n
+                stats['outputs'] += 1
+                if store is None:
+                    note = f'[{mime} output of {n} bytes removed]'
+                else:
+                    path, info = _externalize(container[key], mime, store)
+                    path = path.as_posix()
+                    cell['metadata'].setdefault('externalized_outputs', []).append(
+                        {'output': index, 'key': key, 'mime': mime, 'path': path, **info})
+                    note = f'[{mime} output of {n} bytes moved to {path}]'
+                if container is output: # stream text / error traceback
+                    container[key] = [note]
+                else:
+                    del container[key]
+                    if 'text/plain' not in container:
+                        container['text/plain'] = [note]
+        yield cell
+
+
+def restore_cells(cells, stats):
+    '''
+    Put externalized output values back from the store.
+    '''
+    for cell in cells:
+        for entry in cell.get('metadata', {}).pop('externalized_outputs', []):
+            output = cell['outputs'][entry['output']]
+            data = Path(entry['path']).read_bytes()
+            # entries without a format predate it: binary with a newline, or lines
+            fmt = entry.get('format', 'binary' if entry['mime'] in BINARY else 'lines')
+            if fmt == 'binary':
+                value = base64.b64encode(data).decode('ascii') + '\n' * entry.get('trailing_newline', True)
+            elif fmt == 'string':
+                value = data.decode('utf-8')
+            elif fmt == 'json':
+                value = json.loads(data.decode('utf-8'))
+            else:
+                value = data.decode('utf-8').splitlines(keepends=True)
+            if entry['key'] in ('text', 'traceback'):
+                output[entry['key']] = value
+            else:
+                bundle = output.setdefault('data', {})
+                # drop the placeholder, keep a real text/plain
+                if PLACEHOLDER.fullmatch(''.join(bundle.get('text/plain', ''))):
+                    del bundle['text/plain']
+                bundle[entry['key']] = value
+            stats['outputs'] += 1
+            stats['bytes'] += len(data)
+        yield cell
+
+
+def rewrite(notebook, command, threshold, store):
+    '''
+    Stream a notebook through strip / externalize / restore and write it back.
+    '''
+    stats = {'outputs': 0, 'bytes': 0}
+    rest = {}
+    cells = stream_notebook(notebook, rest)
+    if command == 'restore':
+        cells = restore_cells(cells, stats)
+    else:
+        cells = shrink_cells(cells, threshold, store if command == 'externalize' else None, stats)
+
+    before = os.path.getsize(notebook)
+    tmp = f'{notebook}.rewrite'
+    write_notebook(tmp, cells, rest)
+    if stats['outputs']:
+        os.replace(tmp, notebook)
+    else: # nothing to do, leave the file (and its mtime) alone
+        os.remove(tmp)
+    after = os.path.getsize(notebook)
+    print(f"{command}: {stats['outputs']} outputs, {before / 2**20:.2f} -> {after / 2**20:.2f} MiB  {notebook}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['report', 'strip', 'externalize', 'restore'])
+    parser.add_argument('notebooks', nargs='*',
+                        help='notebooks (default: every notebook under book/tutorials)')
+    parser.add_argument('--threshold', type=int, default=THRESHOLD,
+                        help='output size limit in bytes (strip / externalize)')
+    parser.add_argument('--store', default=STORE, help='directory of externalized outputs')
+    parser.add_argument('--top', type=int, default=20, help='cells listed by report')
+    # options may follow the notebook list, as in the usage above
+    args = parser.parse_intermixed_args()
+
+    notebooks = args.notebooks or sorted(
+        p.as_posix() for p in Path('book/tutorials').rglob('*.ipynb')
+        if '.ipynb_checkpoints' not in p.as_posix())
+
+    if args.command == 'report':
+        report(notebooks, args.top)
+    else:
+        for notebook in notebooks:
+            rewrite(notebook, args.command, args.threshold, args.store)
+
+
+if __name__ == '__main__':
+    main()
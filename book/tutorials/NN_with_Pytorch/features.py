@@ -0,0 +1,278 @@
+import time
+
+import numpy as np
+
+
+# metloom column -> (clean_data column, conversion to metric)
+CONVERSIONS = {
+    'SWE': ('swe', lambda x: x * 2.54),                      # in -> cm
+    'SNOWDEPTH': ('snowdepth', lambda x: x * 2.54),          # in -> cm
+    'PRECIPITATION': ('precipitation', lambda x: x * 2.54),  # in -> cm
+    'AVG AIR TEMP': ('tempavg', lambda x: (x - 32) * 5 / 9), # degF -> degC
+}
+ROLLING = {'tempavg': 'tempavg_7_days_avg', 'precipitation': 'precip_7_days_avg'}
+CLEAN_COLUMNS = ['swe', 'snowdepth', 'tempavg_7_days_avg', 'precip_7_days_avg', 'snowdensity']
+WINDOW = 7
+
+
+def to_metric(data, station='site'):
+    """
+    Convert metloom daily data (one or many stations) to the metric long frame used here
+
+    Arguments:
+    ---------
+        -* data: dataframe from SnotelPointData.get_daily_data, or several of them
+                 concatenated, with datetime/station as index levels or columns
+        -* station: name of the station id column/index level
+
+    Returns:
+    --------
+        -* frame: columns station, datetime, swe, snowdepth, precipitation, tempavg [cm, degC]
+    """
+    import pandas as pd
+
+    data = data.reset_index()
+    out = pd.DataFrame({
+        'station': data[station].to_numpy() if station in data else 'station',
+        'datetime': pd.to_datetime(data['datetime']).dt.tz_localize(None),
+    })
+    for column, (name, convert) in CONVERSIONS.items():
+        out[name] = convert(pd.to_numeric(data[column], errors='coerce').to_numpy(np.float64))
+    return out
+
+
+def window_bounds(keys, window=WINDOW):
+    """
+    Row ranges [lo, hi) holding each row's previous `window` days
+
+    Arguments:
+    ---------
+        -* keys: sorted int64 array of station/day keys (see rolling_features)
+        -* window: window length [days]
+
+    Returns:
+    --------
+        -* lo, hi: int arrays, same length as keys
+    """
+    lo = np.searchsorted(keys, keys - window, side='left')
+    if len(keys) < 2 or np.all(keys[1:] > keys[:-1]):
+        hi = np.arange(len(keys)) # one row per station/day: the window ends at the row itself
+    else:
+        hi = np.searchsorted(keys, keys, side='left') # excludes the day itself
+    return lo, hi
+
+
+def rolling_previous_mean(keys, values, window=WINDOW, bounds=None):
+    """
+    Mean of each row's previous `window` days, for many stations in one pass
+
+    Rows are identified by an int64 key that is (station number * big gap +
+    day number) and must be sorted. The window [day - window, day - 1] of every
+    row is found with searchsorted, and its sum / count come from cumulative
+    sums, so the cost is O(n log n) whatever the number of stations.
+    Like the notebook's shift().rolling('7D', min_periods=7), a mean is only
+    returned when all `window` previous days are present and not NaN.
+
+    Arguments:
+    ---------
+        -* keys: sorted int64 array of station/day keys
+        -* values: float array, same length (NaN = missing)
+        -* window: window length [days]
+        -* bounds: optional window_bounds(keys, window), to share between variables
+
+    Returns:
+    --------
+        -* means: float64 array, NaN where the window is incomplete
+    """
+    lo, hi = window_bounds(keys, window) if bounds is None else bounds
+    valid = np.isfinite(values)
+    # leading 0 so window sums are csum[hi] - csum[lo]
+    csum = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    ccount = np.concatenate([[0], np.cumsum(valid)])
+
+    count = ccount[hi] - ccount[lo]
+    means = np.full(len(keys), np.nan)
+    full = count == window
+    means[full] = (csum[hi[full]] - csum[lo[full]]) / window
+    return means
+
+
+def _station_day_keys(frame):
+    """
+    Sort a long frame by station / datetime and build its rolling keys
+    """
+    import pandas as pd
+
+    codes, _ = pd.factorize(frame['station'], sort=True)
+    days = frame['datetime'].to_numpy('datetime64[D]').astype(np.int64)
+    # the gap between stations is far wider than any window
+    keys = codes.astype(np.int64) * (days.max() - days.min() + 10 * WINDOW + 1) + (days - days.min())
+    if np.any(keys[1:] < keys[:-1]):
+        order = np.argsort(keys, kind='stable')
+        frame, keys = frame.take(order).reset_index(drop=True), keys[order]
+    return frame, keys
+
+
+def rolling_features(frame, window=WINDOW):
+    """
+    Add the 7-day averages of the previous days to a long metric frame
+
+    Arguments:
+    ---------
+        -* frame: long frame from to_metric (any number of stations)
+        -* window: window length [days]
+
+    Returns:
+    --------
+        -* frame: sorted by station / datetime, with tempavg_7_days_avg and precip_7_days_avg
+    """
+    frame, keys = _station_day_keys(frame)
+    bounds = window_bounds(keys, window)
+    # assign() leaves the caller's frame alone
+    return frame.assign(**{
+        target: rolling_previous_mean(keys, frame[source].to_numpy(np.float64), window, bounds)
+        for source, target in ROLLING.items()})
+
+
+def append_days(tail, new, window=WINDOW):
+    """
+    Compute the rolling features of newly downloaded days without recomputing history
+
+    Only the last `window` days of every station are needed from the past.
+
+    Arguments:
+    ---------
+        -* tail: the tail returned by a previous call (or history.groupby('station').tail(window),
+                 or None for the first batch)
+        -* new: long metric frame with the new days (to_metric)
+        -* window: window length [days]
+
+    Returns:
+    --------
+        -* features: rolling_features() of the new rows only
+        -* tail: the rows to pass as `tail` next time
+    """
+    import pandas as pd
+
+    new = new.assign(_new=True)
+    if tail is not None:
+        new = pd.concat([tail[[c for c in new.columns if c != '_new']].assign(_new=False), new],
+                        ignore_index=True)
+        # days already in the history are not recomputed
+        new = new.drop_duplicates(['station', 'datetime'], keep='first')
+    frame = rolling_features(new, window)
+
+    features = frame[frame.pop('_new')].reset_index(drop=True)
+    # every day of the last window, so a gap just before the next batch stays a gap
+    last = frame.groupby('station')['datetime'].transform('max')
+    tail = frame[frame['datetime'] > last - pd.Timedelta(days=window)]
+    tail = tail.drop(columns=list(ROLLING.values())).reset_index(drop=True)
+    return features, tail
+
+
+def to_clean_data(features, keep_ids=False):
+    """
+    Apply the notebook's cleaning and return the training schema of data/clean_data.csv
+
+    Arguments:
+    ---------
+        -* features: frame from rolling_features / append_days
+        -* keep_ids: also keep the station and datetime columns (in front)
+
+    Returns:
+    --------
+        -* clean: swe, snowdepth, tempavg_7_days_avg, precip_7_days_avg, snowdensity
+    """
+    columns = ['swe', 'snowdepth', 'tempavg_7_days_avg', 'precip_7_days_avg']
+    clean = features.dropna(subset=columns)
+    clean = clean[(clean['snowdepth'] > 5) & (clean['swe'] > 3)]
+    clean = clean.assign(snowdensity=clean['swe'] / clean['snowdepth'])
+    return clean[(['station', 'datetime'] if keep_ids else []) + CLEAN_COLUMNS] \
+        .reset_index(drop=True)
+
+
+def synthetic_stations(n_stations=1000, years=40, missing=0.01, seed=0):
+    """
+    Random daily metric data for many stations (for benchmarking)
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1984-10-01', periods=int(years * 365.25), freq='D')
+    n = len(dates) * n_stations
+    doy = np.tile(dates.dayofyear.to_numpy(), n_stations)
+    season = np.cos(2 * np.pi * (doy - 45) / 365.25) # 1 in mid February
+
+    frame = pd.DataFrame({
+        'station': np.repeat(np.arange(n_stations), len(dates)),
+        'datetime': np.tile(dates.to_numpy(), n_stations),
+        'swe': np.maximum(season, 0) * rng.uniform(20, 80, n),
+        'snowdepth': np.maximum(season, 0) * rng.uniform(60, 250, n),
+        'precipitation': rng.exponential(0.5, n),
+        'tempavg': -10 * season + rng.normal(0, 4, n),
+    })
+    for column in ('precipitation', 'tempavg'):
+        frame.loc[rng.random(n) < missing, column] = np.nan
+    # and some days without any record
+    return frame[rng.random(n) >= missing / 2].reset_index(drop=True)
+
+
+def _rolling_reference(frame):
+    """
+    The notebook's pandas version, one station at a time (for checking)
+    """
+    out = []
+    for _, station in frame.groupby('station', sort=True):
+        station = station.set_index('datetime').asfreq('D') # shift() by row == by day
+        for source, target in ROLLING.items():
+            station[target] = station[source].shift().rolling(window='7D', min_periods=7).mean()
+        out.append(station.dropna(subset=['station']).reset_index())
+    return out
+
+
+def benchmark_features(n_stations=1000, years=40, check_stations=20, seed=0):
+    """
+    Time the vectorized rolling features against the per-station pandas version
+
+    Arguments:
+    ---------
+        -* n_stations: number of stations
+        -* years: years of daily data per station (1000 x 40 is ~14.6 M rows)
+        -* check_stations: stations used for the pandas reference (timed and compared)
+        -* seed: random seed
+    """
+    import pandas as pd
+
+    frame = synthetic_stations(n_stations, years, seed=seed)
+    print(f'{n_stations} stations x {years} years = {len(frame):,} rows')
+
+    t0 = time.perf_counter()
+    features = rolling_features(frame)
+    t_all = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    clean = to_clean_data(features)
+    t_clean = time.perf_counter() - t0
+    print(f'vectorized rolling: {t_all:.2f} s, cleaning: {t_clean:.2f} s, {len(clean):,} training rows')
+
+    subset = frame[frame['station'] < check_stations]
+    t0 = time.perf_counter()
+    reference = pd.concat(_rolling_reference(subset), ignore_index=True)
+    t_ref = time.perf_counter() - t0
+    print(f'pandas per station: {t_ref:.2f} s for {check_stations} stations '
+          f'(~{t_ref * n_stations / check_stations:.0f} s for all)')
+
+    mine = features[features['station'] < check_stations].reset_index(drop=True)
+    for target in ROLLING.values():
+        np.testing.assert_allclose(mine[target], reference[target], rtol=1e-9, atol=1e-6)
+
+    # incremental: the last year appended to the first 39
+    split = frame['datetime'].max() - pd.Timedelta(days=365)
+    history = frame[frame['datetime'] <= split]
+    _, tail = append_days(None, history)
+    t0 = time.perf_counter()
+    added, _ = append_days(tail, frame[frame['datetime'] > split])
+    t_add = time.perf_counter() - t0
+    expected = features[features['datetime'] > split].reset_index(drop=True)
+    for target in ROLLING.values():
+        np.testing.assert_allclose(added[target], expected[target], rtol=1e-9, atol=1e-6)
+    print(f'append one year: {t_add:.2f} s (matches the full recomputation)')
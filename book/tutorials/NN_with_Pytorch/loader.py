@@ -0,0 +1,235 @@
+import json
+import os
+
+import numpy as np
+
+
+COLUMNS = ['swe', 'snowdepth', 'tempavg_7_days_avg', 'precip_7_days_avg', 'snowdensity']
+TARGET = 'snowdensity'
+
+
+def _stats_path(npy_path):
+    return os.path.splitext(npy_path)[0] + '.json'
+
+
+def _count_rows(csv_path):
+    """
+    Count the data rows of a CSV without parsing it
+    """
+    rows = 0
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(2**24), b''):
+            rows += block.count(b'\n')
+        if f.tell() == 0: # empty file, not even a header
+            return 0
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n': # last line without a newline
+            rows += 1
+    return rows - 1 # header
+
+
+def compute_stats(data, indices=None, chunk_rows=2**20):
+    """
+    Column means and standard deviations of a (memory-mapped) array, a chunk at a time
+
+    Sums are accumulated in float64, so float32 storage does not cost accuracy.
+
+    Arguments:
+    ---------
+        -* data: 2D array (rows x columns), e.g. from np.load(..., mmap_mode='r')
+        -* indices: optional row indices to use (e.g. the training split only)
+        -* chunk_rows: number of rows in memory at once
+
+    Returns:
+    --------
+        -* mean, std: float64 arrays with one value per column (population std, like StandardScaler)
+    """
+    n = len(data) if indices is None else len(indices)
+    total = np.zeros(data.shape[1])
+    total_sq = np.zeros(data.shape[1])
+    for start in range(0, n, chunk_rows):
+        if indices is None:
+            chunk = data[start:start + chunk_rows]
+        else:
+            # sorted indices keep the memmap reads sequential
+            chunk = data[np.sort(indices[start:start + chunk_rows])]
+        chunk = chunk.astype(np.float64)
+        total += chunk.sum(axis=0)
+        total_sq += np.square(chunk).sum(axis=0)
+    mean = total / n
+    std = np.sqrt(np.maximum(total_sq / n - mean**2, 0))
+    std[std == 0] = 1 # constant columns are left as they are
+    return mean, std
+
+
+def csv_to_npy(csv_path, npy_path=None, columns=COLUMNS, chunksize=10**6, overwrite=False):
+    """
+    Convert a clean_data style CSV once to a float32 .npy file
+
+    The CSV is streamed with pandas chunks straight into a memory-mapped .npy,
+    so the conversion never holds more than chunksize rows. Column names and
+    normalization statistics are written next to it (<name>.json). The file is
+    only rebuilt when the CSV is newer than the .npy.
+
+    Arguments:
+    ---------
+        -* csv_path: path to the CSV (e.g. data/clean_data.csv)
+        -* npy_path: output path (default: the CSV path with a .npy suffix)
+        -* columns: columns to keep, in order (the target last)
+        -* chunksize: CSV rows parsed at a time
+        -* overwrite: rebuild even if the .npy is up to date
+
+    Returns:
+    --------
+        -* npy_path: path to the .npy file
+    """
+    import pandas as pd
+
+    if npy_path is None:
+        npy_path = os.path.splitext(csv_path)[0] + '.npy'
+    if (not overwrite and os.path.exists(npy_path) and os.path.exists(_stats_path(npy_path))
+            and os.path.getmtime(npy_path) >= os.path.getmtime(csv_path)):
+        return npy_path
+
+    n_rows = _count_rows(csv_path)
+    tmp_path = npy_path + '.tmp.npy'
+    data = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                     shape=(n_rows, len(columns)))
+    start = 0
+    dtypes = {c: np.float32 for c in columns}
+    for chunk in pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        data[start:start + len(chunk)] = chunk[columns].to_numpy()
+        start += len(chunk)
+    if start != n_rows: # blank lines in the CSV
+        raise ValueError(f'{csv_path}: counted {n_rows} rows but parsed {start}')
+
+    mean, std = compute_stats(data)
+    data.flush()
+    del data
+    os.replace(tmp_path, npy_path)
+    with open(_stats_path(npy_path), 'w') as f:
+        json.dump({'columns': list(columns), 'rows': n_rows,
+                   'mean': mean.tolist(), 'std': std.tolist()}, f, indent=1)
+    return npy_path
+
+
+def load_stats(npy_path):
+    """
+    Read the column names and normalization statistics written by csv_to_npy
+    """
+    with open(_stats_path(npy_path)) as f:
+        return json.load(f)
+
+
+def split_indices(n, val_size=0.15, test_size=0.15, seed=0):
+    """
+    Shuffled train / validation / test row indices (the 70/15/15 split of the FFN notebook)
+
+    Returns:
+    --------
+        -* train, val, test: int64 index arrays
+    """
+    order = np.random.default_rng(seed).permutation(n)
+    n_test = int(round(n * test_size))
+    n_val = int(round(n * val_size))
+    return order[n_test + n_val:], order[n_test:n_test + n_val], order[:n_test]
+
+
+class SNOTELMemmapDataset:
+    """
+    A map-style torch dataset that reads features and targets from a float32 .npy memmap
+
+    Nothing is loaded at construction; each worker process opens its own
+    memmap on first access, so start-up time and RAM do not grow with the
+    file. Without normalization the samples are zero-copy torch.from_numpy
+    views of the memmap.
+
+    Indexing with a list/array of rows returns a whole batch with one
+    memmap read; use make_loader() to drive it that way.
+
+    torch is only imported when samples are read, so the module stays cheap
+    to import for the conversion / statistics helpers.
+
+    Arguments:
+    ---------
+        -* npy_path: .npy file from csv_to_npy
+        -* indices: optional row indices of this split (default: all rows)
+        -* target: name of the target column
+        -* normalize: standardize the features with (mean, std)
+        -* stats: optional (mean, std) over all columns, e.g. compute_stats(data, train_idx);
+                  default: the statistics precomputed over the whole file
+    """
+    def __init__(self, npy_path, indices=None, target=TARGET, normalize=True, stats=None):
+        info = load_stats(npy_path)
+        self.npy_path = npy_path
+        self.columns = info['columns']
+        self.indices = None if indices is None else np.asarray(indices, dtype=np.int64)
+        self.n_rows = info['rows'] if indices is None else len(self.indices)
+
+        target_col = self.columns.index(target)
+        self.feature_cols = [i for i in range(len(self.columns)) if i != target_col]
+        self.target_col = target_col
+        # contiguous feature columns can be sliced instead of fancy-indexed
+        self._feature_slice = (slice(0, target_col) if target_col == len(self.columns) - 1
+                               else self.feature_cols)
+
+        self.normalize = normalize
+        mean, std = stats if stats is not None else (info['mean'], info['std'])
+        self.mean = np.asarray(mean, dtype=np.float32)[self.feature_cols]
+        self.std = np.asarray(std, dtype=np.float32)[self.feature_cols]
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            # copy-on-write: writeable for torch.from_numpy, the file is never modified
+            self._data = np.load(self.npy_path, mmap_mode='c')
+        return self._data
+
+    def __getstate__(self):
+        # workers reopen the memmap instead of receiving a pickled copy
+        state = self.__dict__.copy()
+        state['_data'] = None
+        return state
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, idx):
+        if self.indices is not None:
+            idx = self.indices[idx]
+        if not np.isscalar(idx):
+            idx = np.sort(np.asarray(idx)) # sequential reads; batch order does not matter
+        rows = self.data[idx]
+        features = rows[..., self._feature_slice]
+        target = rows[..., self.target_col:self.target_col + 1]
+        if self.normalize:
+            features = (features - self.mean) / self.std
+        import torch
+        return torch.from_numpy(features), torch.from_numpy(target)
+
+
+def make_loader(dataset, batch_size=32, shuffle=False, num_workers=0, drop_last=False, **kwargs):
+    """
+    A DataLoader that fetches whole batches from a SNOTELMemmapDataset
+
+    The batch sampler hands each worker a list of rows, so every batch is a
+    single vectorized memmap read instead of batch_size separate ones.
+
+    Arguments:
+    ---------
+        -* dataset: SNOTELMemmapDataset
+        -* batch_size, shuffle, drop_last: as for torch.utils.data.DataLoader
+        -* num_workers: worker processes (each opens its own memmap)
+        -* kwargs: passed on to DataLoader (pin_memory, persistent_workers, ...)
+
+    Returns:
+    --------
+        -* loader: yields (features, targets) tensors of shape (batch, n_features) and (batch, 1)
+    """
+    from torch.utils.data import BatchSampler, DataLoader, RandomSampler, SequentialSampler
+
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    batches = BatchSampler(sampler, batch_size=batch_size, drop_last=drop_last)
+    return DataLoader(dataset, sampler=batches, batch_size=None,
+                      num_workers=num_workers, **kwargs)
@@ -1,57 +1,175 @@
+import time
+
 import numpy as np
-import matplotlib.pyplot as plt
 
-def Sigmoid(z):
+
+def _prepare(z, out, dtype, keep_int=False):
+    """
+    Turn z into an array and find/allocate the output array for an activation
+
+    Without dtype the output keeps a float type of z; other types become float64,
+    except integers when keep_int is set (ReLu maps integers to integers)
+    """
+    z = np.asarray(z)
+    if dtype is None:
+        keep = np.issubdtype(z.dtype, np.floating) or (keep_int and np.issubdtype(z.dtype, np.integer))
+        dtype = z.dtype if keep else np.float64
+    if out is None:
+        out = np.empty(z.shape, dtype=dtype)
+    return z, out
+
+
+def _scalar(result, out):
+    """
+    A numpy scalar instead of a 0-d array for scalar input, as np.exp / np.tanh return
+    """
+    return result[()] if out is None and result.ndim == 0 else result
+
+
+def Sigmoid(z, out=None, dtype=None):
     """
     A function that performs the sigmoid transformation
+
+    Numerically stable: large negative inputs no longer overflow in exp(-z).
     
     Arguments:
     ---------
         -* z: array/list of numbers to activate
+        -* out: optional array to write the result into (may be z itself)
+        -* dtype: optional output dtype, e.g. np.float32 (default: float type of z)
     
     Returns:
     --------
         -* logistic: the transformed/activated version of the array
     """
-    logistic = 1 / (1 + np.exp(-z))
-    return logistic
+    z, logistic = _prepare(z, out, dtype)
+    try:
+        from scipy.special import expit
+    except ImportError:
+        # 1 / (1 + e^|z|) is sigmoid(-|z|) and never overflows into a NaN;
+        # sigmoid(z) = 1 - sigmoid(-z) for the positive half
+        positive = z >= 0
+        np.abs(z, out=logistic)
+        with np.errstate(over='ignore'):
+            np.exp(logistic, out=logistic)
+        logistic += 1
+        np.reciprocal(logistic, out=logistic)
+        np.subtract(1, logistic, out=logistic, where=positive)
+        return _scalar(logistic, out)
+    return _scalar(expit(z, out=logistic), out)
     
 
-def Tanh(z):
+def Tanh(z, out=None, dtype=None):
     """
     A function that performs the hyperbolic tangent transformation
     
     Arguments:
     ---------
         -* z: array/list of numbers to activate
+        -* out: optional array to write the result into (may be z itself)
+        -* dtype: optional output dtype, e.g. np.float32 (default: float type of z)
     
     Returns:
     --------
         -* hyp: the transformed/activated version of the array
     """
-    hyp = np.tanh(z)
-    return hyp
+    z, hyp = _prepare(z, out, dtype)
+    return _scalar(np.tanh(z, out=hyp), out)
 
 
-def ReLu(z):
+def ReLu(z, out=None, dtype=None):
     """
     A function that performs the rectified linear unit transformation
     
     Arguments:
     ---------
         -* z: array/list of numbers to activate
+        -* out: optional array to write the result into (may be z itself)
+        -* dtype: optional output dtype, e.g. np.float32 (default: dtype of z; integers stay integers)
     
     Returns:
     --------
         -* points: the transformed/activated version of the array
     """
-    points = np.where(z < 0, 0, z)
-    return points
+    z, points = _prepare(z, out, dtype, keep_int=True)
+    # a single pass, without building both branches of np.where
+    return np.maximum(z, 0, out=points)
+
+
+def apply_chunked(activation, z, out=None, dtype=None, chunk_size=2**22):
+    """
+    Apply an activation to a (possibly memory-mapped) array a chunk at a time
+
+    Only chunk_size elements are in memory at once, so arrays larger than RAM
+    (e.g. np.memmap / np.load(..., mmap_mode='r')) can be transformed into
+    another memory-mapped array. That needs out: without it the whole result
+    is allocated in memory, e.g.
+        out = np.lib.format.open_memmap('relu.npy', mode='w+', dtype=z.dtype, shape=z.shape)
+        apply_chunked(ReLu, z, out=out)
+
+    Arguments:
+    ---------
+        -* activation: Sigmoid, Tanh or ReLu
+        -* z: array to activate
+        -* out: C-contiguous array of the same shape to write into (e.g. an np.memmap opened with 'w+');
+                 when not given, a new in-memory array (as large as z) is returned
+        -* dtype: output dtype when out is not given
+        -* chunk_size: number of elements per chunk
+
+    Returns:
+    --------
+        -* out: the transformed/activated version of the array
+    """
+    z, out = _prepare(z, out, dtype, keep_int=activation is ReLu)
+    # reshape copies a non-contiguous array, the results would never reach out
+    if not out.flags.c_contiguous:
+        raise ValueError('out must be C-contiguous')
+    flat_z = z.reshape(-1)
+    flat_out = out.reshape(-1)
+    for start in range(0, flat_z.size, chunk_size):
+        stop = start + chunk_size
+        activation(flat_z[start:stop], out=flat_out[start:stop])
+    return out
+
+
+def benchmark_activations(n=10**8, dtype=np.float32, seed=0):
+    """
+    Compare the original allocating activations with the in-place versions
+
+    Arguments:
+    ---------
+        -* n: number of elements (1e8 float32 values are 400 MB per array)
+        -* dtype: input dtype
+        -* seed: random seed
+    """
+    originals = {
+        'Sigmoid': lambda z: 1 / (1 + np.exp(-z)),
+        'Tanh': lambda z: np.tanh(z),
+        'ReLu': lambda z: np.where(z < 0, 0, z),
+    }
+    z = np.random.default_rng(seed).normal(0, 10, n).astype(dtype)
+    out = np.empty_like(z)
+
+    print(f'{n:.0e} {np.dtype(dtype).name} elements')
+    for activation in (Sigmoid, Tanh, ReLu):
+        name = activation.__name__
+        activation(z[:10]) # warm up (imports)
+        t0 = time.perf_counter()
+        with np.errstate(over='ignore'):
+            originals[name](z)
+        t_old = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        activation(z, out=out)
+        t_new = time.perf_counter() - t0
+        print(f'{name:>8}: original {t_old:.3f} s, in-place {t_new:.3f} s')
 
 def plot_activations():
     """
     A function to plot the Sigmoid, Tanh, and ReLU activation functions.
     """
+    import matplotlib.pyplot as plt
+
     z = np.linspace(-10, 10, 100)
     fa = plt.figure(figsize=(16, 5))
 
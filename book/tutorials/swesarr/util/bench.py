@@ -0,0 +1,644 @@
+'''
+timing scripts for the SWESARR tutorial helpers.
+
+nothing here downloads data: every benchmark builds its own synthetic inputs.
+
+the 'suite' benchmark times and memory-profiles the main helpers on synthetic 
+GeoTIFFs, radiometer CSVs and snow pit tables of several sizes. its results can 
+be saved as a baseline and later runs compared against it, failing on regressions.
+
+usage (from the util directory):
+    python bench.py suite --sizes small medium --save-baseline baseline.json
+    python bench.py suite --sizes small medium --compare baseline.json
+    python bench.py colocate
+    python bench.py reproject
+    python bench.py pits
+    python bench.py boxes
+    python bench.py footprints
+    python bench.py transformer
+    python bench.py outofcore --shape 6 30000 30000 --max-rss 16 --tmp-dir /scratch
+    python bench.py imports --import-ms 500 --import-rss 64
+    python bench.py plots
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from helper import (TileCache, box_means, colocate, filt_pit_to_sar, filt_radiom_points, get_transformer,
+                    join_files, join_sar_radiom, pit_swe, read_radiom, sar_swe_plot, utm_crs)
+
+
+def _timeit(func, *args, repeat=3, **kwargs):
+    '''
+    best-of-N wall time [s] of func(*args, **kwargs)
+    '''
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_colocate(sizes=(1e3, 1e4, 1e5, 1e6), grid=(4000, 6000), seed=0):
+    '''
+    time colocate() for an increasing number of radiometer samples.
+
+    the SAR grid mimics a reprojected SWESARR mosaic over Grand Mesa:
+    latitude stored descending, longitude ascending.
+    '''
+    rng = np.random.default_rng(seed)
+    lat_sar = np.linspace(39.10, 38.95, grid[0])
+    lon_sar = np.linspace(-108.25, -107.95, grid[1])
+
+    print(f'{"samples":>10} {"time [s]":>10} {"samples/s":>12}')
+    for n in sizes:
+        n = int(n)
+        lat_rad = rng.uniform(lat_sar[-1], lat_sar[0], n)
+        lon_rad = rng.uniform(lon_sar[0], lon_sar[-1], n)
+        t = _timeit(colocate, lat_sar, lon_sar, lat_rad, lon_rad)
+        print(f'{n:>10d} {t:>10.4f} {n / t:>12.0f}')
+
+
+def synthetic_sar(shape=(6, 12000, 12000), res=1.0, chunks=(1, 2048, 2048), seed=0):
+    '''
+    lazy 6-band SWESARR-like mosaic in UTM zone 12N over Grand Mesa.
+
+    values are random backscatter [dB] generated chunk by chunk, so a multi-GB 
+    raster costs nothing until something computes it.
+    '''
+    import dask.array as darr
+    import rioxarray # noqa: F401, registers the .rio accessor
+    import xarray as xr
+
+    nb, ny, nx = shape
+    x0, y0 = 742000.0, 4330000.0
+    data = darr.random.default_rng(seed).uniform(-25, 0, shape, chunks=chunks).astype('float32')
+    da = xr.DataArray(data, dims=('band', 'y', 'x'),
+                      coords={'band': ['09VV', '09VH', '13VV', '13VH', '17VV', '17VH'][:nb],
+                              'y': y0 - res * (np.arange(ny) + 0.5),
+                              'x': x0 + res * (np.arange(nx) + 0.5)})
+    return da.rio.write_crs('EPSG:32612')
+
+
+def synthetic_radiom(da, n=10000, seed=0):
+    '''
+    radiometer dataframe with n samples scattered over the footprint of da
+    '''
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(da.x.data.min(), da.x.data.max(), n)
+    y = rng.uniform(da.y.data.min(), da.y.data.max(), n)
+    lon, lat = get_transformer(da.rio.crs.to_string(), 'EPSG:4326').transform(x, y)
+    t0 = np.datetime64('2020-02-11T18:33:53')
+    utc = pd.Series(t0 + np.arange(n) * np.timedelta64(100, 'ms')).dt.strftime('%Y%m%d-%H:%M:%S.%f')
+    return pd.DataFrame({'UTC': utc, 'Longitude (deg)': lon, 'Latitude (deg)': lat,
+                         'Elevation (m)': 3000.0,
+                         'TB X (K)': rng.uniform(230, 260, n),
+                         'TB K (K)': rng.uniform(220, 250, n),
+                         'TB Ka (K)': rng.uniform(210, 240, n)})
+
+
+def _run_join(method, shape, n):
+    # runs in a fresh process, so ru_maxrss is the peak of this method alone
+    da = synthetic_sar(shape)
+    radiom = synthetic_radiom(da, n)
+    t0 = time.perf_counter()
+    join_sar_radiom(da, radiom, method=method)
+    wall = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # [MiB] on linux
+    return wall, peak
+
+
+def bench_reproject(shape=(6, 12000, 12000), n=10000):
+    '''
+    compare join_sar_radiom's 'transform' and 'reproject' co-location on a 
+    synthetic raster. each method runs in its own process for a clean memory peak.
+    '''
+    gib = np.prod(shape) * 4 / 2**30
+    print(f'raster {shape} float32 ({gib:.1f} GiB), {n} radiometer samples')
+    print(f'{"method":>10} {"time [s]":>10} {"peak RSS [MiB]":>15}')
+    ctx = multiprocessing.get_context('spawn')
+    for method in ('transform', 'reproject'):
+        with ctx.Pool(1) as pool:
+            wall, peak = pool.apply(_run_join, (method, shape, n))
+        print(f'{method:>10} {wall:>10.2f} {peak:>15.0f}')
+
+
+def synthetic_pits(n_sites=200, n_dates=5, n_layers=10, extent=12000.0, seed=0):
+    '''
+    snowexsql-like density layer table: n_layers layers per pit, one pit per 
+    site and date, pits scattered over the first extent meters of the 
+    synthetic_sar footprint (UTM 12N)
+    '''
+    import datetime
+    import geopandas as gpd
+    import pandas as pd
+    from shapely.geometry import Point
+
+    rng = np.random.default_rng(seed)
+    sites = [f'{i // 26}{chr(65 + i % 26)}{i % 7}' for i in range(n_sites)]
+    dates = [datetime.date(2020, 2, 1) + datetime.timedelta(days=d) for d in range(n_dates)]
+    x = 742000.0 + rng.uniform(0, extent, n_sites)
+    y = 4330000.0 - rng.uniform(0, extent, n_sites)
+
+    rows = []
+    for i, site in enumerate(sites):
+        for date in dates:
+            depth = rng.uniform(80, 150)
+            tops = np.linspace(depth, 0, n_layers + 1)
+            for top, bottom in zip(tops[:-1], tops[1:]):
+                rows.append((site, date, top, bottom, str(rng.uniform(150, 400)), Point(x[i], y[i])))
+
+    layers = pd.DataFrame(rows, columns=['site_id', 'date', 'depth', 'bottom_depth', 'value', 'geom'])
+    # interleave sites and dates the way database queries return them
+    layers = layers.sample(frac=1, random_state=seed).reset_index(drop=True)
+    return gpd.GeoDataFrame(layers, geometry='geom', crs='EPSG:32612')
+
+
+def _pit_swe_loop(snow_pits):
+    # reference: the original per-site / per-date loop from filt_pit_to_sar
+    import geopandas as gpd
+
+    snow_pits = snow_pits.copy()
+    snow_pits['value'] = snow_pits['value'].astype(float)
+    swe_lambda = lambda row: row['value'] * (row['depth'] - row['bottom_depth']) / 100
+    snow_pits['swe'] = snow_pits.apply(swe_lambda, axis=1)
+
+    point_swe = gpd.GeoDataFrame(columns=['date', 'swe', 'geometry', 'site_id'])
+    my_sites = []
+    for site in snow_pits['site_id'].unique().tolist():
+        if len(site.split()) == 1:
+            ind1 = snow_pits['site_id'] == site
+            for date in snow_pits['date'][ind1].unique().tolist():
+                ind2 = snow_pits['date'] == date
+                profile = snow_pits[ind1 & ind2]
+                data = gpd.pd.DataFrame({'swe': profile['swe'].sum(), 'geometry': profile['geom'].iloc[0],
+                                         'date': date}, index=[0])
+                point_swe = gpd.pd.concat([point_swe, data], ignore_index=True)
+                my_sites.append(site)
+    point_swe['site_id'] = my_sites
+    return point_swe
+
+
+def bench_pits(sizes=(50, 200, 1000)):
+    '''
+    time pit_swe() against the original loop and check both agree
+    '''
+    print(f'{"sites":>6} {"layers":>8} {"loop [s]":>10} {"groupby [s]":>12} {"same":>5}')
+    mismatch = []
+    for n in sizes:
+        pits = synthetic_pits(n_sites=n)
+        t_loop = _timeit(_pit_swe_loop, pits, repeat=1)
+        t_new = _timeit(pit_swe, pits)
+        ref, new = _pit_swe_loop(pits), pit_swe(pits)
+        same = (ref['site_id'].tolist() == new['site_id'].tolist() and
+                ref['date'].tolist() == new['date'].tolist() and
+                np.allclose(ref['swe'].astype(float), new['swe']) and
+                ref['geometry'].tolist() == new['geometry'].tolist())
+        print(f'{n:>6d} {len(pits):>8d} {t_loop:>10.3f} {t_new:>12.4f} {str(same):>5}')
+        if not same:
+            mismatch.append(n)
+    if mismatch:
+        print(f'pit_swe() differs from the original loop for {mismatch} sites')
+        raise SystemExit(1)
+
+
+def _box_means_loop(sar_data, x, y, half_width):
+    # reference: the original per-pit / per-band window loop from filt_pit_to_sar
+    to_nl = lambda a: 10**(a/10)
+    to_db = lambda a: 10*np.log10(a)
+
+    means = np.zeros([sar_data.sizes['band'], len(x)]) * np.nan
+    for ii, (cur_lon, cur_lat) in enumerate(zip(x, y)):
+        sub = sar_data.sel(y=slice(cur_lat + half_width, cur_lat - half_width),
+                           x=slice(cur_lon - half_width, cur_lon + half_width))
+        if not any(n == 0 for n in sub.shape):
+            for jj, band in enumerate(sub['band'].values):
+                means[jj, ii] = to_db(np.mean(to_nl(sub.sel(band=band).values)))
+    return means
+
+
+def bench_boxes(shape=(6, 3000, 3000), sizes=(100, 1000, 10000), box_size=3):
+    '''
+    time box_means() against the original window loop and check both agree
+    '''
+    sar = synthetic_sar(shape).compute()
+    # a few holes and edge pits to exercise the NaN / empty box handling
+    sar[:, 100:110, 200:210] = np.nan
+    rng = np.random.default_rng(0)
+
+    print(f'{"pits":>6} {"loop [s]":>10} {"table [s]":>10} {"same":>5}')
+    mismatch = []
+    for n in sizes:
+        x = rng.uniform(sar.x.data.min() - 2, sar.x.data.max() + 2, n)
+        y = rng.uniform(sar.y.data.min() - 2, sar.y.data.max() + 2, n)
+        t_new = _timeit(box_means, sar, x, y, box_size / 2)
+        if n <= 1000:
+            t_loop = _timeit(_box_means_loop, sar, x, y, box_size / 2, repeat=1)
+            same = np.allclose(_box_means_loop(sar, x, y, box_size / 2),
+                               box_means(sar, x, y, box_size / 2), equal_nan=True)
+            print(f'{n:>6d} {t_loop:>10.3f} {t_new:>10.4f} {str(same):>5}')
+            if not same:
+                mismatch.append(n)
+        else:
+            print(f'{n:>6d} {"-":>10} {t_new:>10.4f} {"-":>5}')
+    if mismatch:
+        print(f'box_means() differs from the original loop for {mismatch} pits')
+        raise SystemExit(1)
+
+
+def bench_footprints(sizes=(1e4, 1e5, 1e6), n_sites=1000):
+    '''
+    time filt_radiom_points() (nearest and footprint-averaged) for an 
+    increasing number of radiometer samples
+    '''
+    da = synthetic_sar((6, 12000, 12000))
+    point_swe = pit_swe(synthetic_pits(n_sites=n_sites, n_dates=1, n_layers=2))
+    point_swe['lat'] = point_swe['geometry'].y
+    point_swe['lon'] = point_swe['geometry'].x
+
+    print(f'{"samples":>10} {"nearest [s]":>12} {"average [s]":>12}')
+    for n in sizes:
+        radiom = synthetic_radiom(da, int(n))
+        t_near = _timeit(filt_radiom_points, 496, 282, 144, radiom, point_swe)
+        t_avg = _timeit(filt_radiom_points, 496, 282, 144, radiom, point_swe, average=True)
+        print(f'{int(n):>10d} {t_near:>12.3f} {t_avg:>12.3f}')
+
+
+def bench_transformer(calls=1000):
+    '''
+    cost of building a pyproj Transformer on every call (the old helpers) 
+    versus the cached get_transformer(), for a single-point transform
+    '''
+    from pyproj import Transformer
+
+    lon, lat = np.array([-108.2]), np.array([39.0])
+
+    def fresh():
+        crs = utm_crs(lon, lat)
+        return Transformer.from_crs('EPSG:4326', crs, always_xy=True).transform(lon, lat)
+
+    def cached():
+        crs = utm_crs(lon, lat)
+        return get_transformer('EPSG:4326', crs).transform(lon, lat)
+
+    for name, func in (('new Transformer', fresh), ('get_transformer', cached)):
+        t0 = time.perf_counter()
+        for _ in range(calls):
+            func()
+        t = (time.perf_counter() - t0) / calls
+        print(f'{name:>16}: {t * 1e6:10.1f} us/call')
+
+
+def _run_pipeline_capped(paths, pits, max_bytes, n_check=200):
+    # runs in a fresh process with its address space capped at max_bytes, so going over
+    # the budget fails right there (MemoryError) instead of being reported afterwards
+    import dask
+
+    resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+    try:
+        t0 = time.perf_counter()
+        with dask.config.set(scheduler='threads'):
+            da = join_files(paths)
+            point_swe_filt, swesarr_mean = filt_pit_to_sar(pits, da, 3)
+        wall = time.perf_counter() - t0
+
+        # reference: the original window loop, reading only the boxes of a sample of pits
+        n = len(point_swe_filt)
+        sample = np.random.default_rng(0).choice(n, min(n_check, n), replace=False)
+        ref = _box_means_loop(da, point_swe_filt['lon'].to_numpy()[sample],
+                              point_swe_filt['lat'].to_numpy()[sample], 1.5)
+        same = np.allclose(ref, swesarr_mean[:, sample], equal_nan=True)
+    except MemoryError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20 # [GiB] on linux
+    return wall, peak, n, bool(same)
+
+
+def bench_out_of_core(shape=(6, 30000, 30000), sites=2000, max_rss=16, tmp_dir=None):
+    '''
+    join_files -> filt_pit_to_sar on GeoTIFF tiles of a mosaic larger than memory.
+
+    first checks that the lazy (dask-backed) pipeline and the in-memory one agree on
+    a small mosaic. the big mosaic is then written to GeoTIFF tiles and processed in
+    its own process with the address space capped at max_rss [GiB] (RLIMIT_AS):
+    going over the budget raises MemoryError there and fails the run, and its box
+    means are checked against the original window loop on a sample of pits.
+    '''
+    import tempfile
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        small_dir = os.path.join(tmp, 'small')
+        os.makedirs(small_dir)
+        paths = write_sar_tifs(small_dir, (6, 1500, 1500))
+        pits = synthetic_pits(n_sites=300, n_dates=1, n_layers=2, extent=1500.0)
+        da = join_files(paths)
+        lazy_pits, lazy_mean = filt_pit_to_sar(pits, da, 3)
+        eager_pits, eager_mean = filt_pit_to_sar(pits, da.compute(), 3)
+        same = (lazy_pits['site_id'].tolist() == eager_pits['site_id'].tolist() and
+                np.allclose(lazy_mean, eager_mean, equal_nan=True))
+        print(f'lazy == in-memory on a small mosaic: {same}')
+
+        big_dir = os.path.join(tmp, 'big')
+        os.makedirs(big_dir)
+        gib = np.prod(shape) * 4 / 2**30
+        print(f'writing {shape} float32 GeoTIFFs ({gib:.1f} GiB) to {big_dir}')
+        t0 = time.perf_counter()
+        paths = write_sar_tifs(big_dir, shape)
+        print(f'written in {time.perf_counter() - t0:.1f} s')
+
+        pits = synthetic_pits(n_sites=sites, n_dates=1, n_layers=2, extent=float(min(shape[1:])))
+        print(f'{sites} pits, address space capped at {max_rss} GiB')
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            result = pool.apply(_run_pipeline_capped, (paths, pits, int(max_rss * 2**30)))
+
+    if result is None:
+        print(f'MemoryError: join_files -> filt_pit_to_sar needs more than {max_rss} GiB')
+        raise SystemExit(1)
+    wall, peak, n_pits, same_big = result
+    print(f'time {wall:.1f} s, peak RSS {peak:.2f} GiB, {n_pits} pits with data, '
+          f'matches the window loop: {same_big}')
+    if not same or not same_big:
+        raise SystemExit(1)
+
+
+def bench_plots(sizes=(1e3, 1e4, 1e5, 1e6, 1e7), matplotlib_max=1e4, seed=0):
+    '''
+    time sar_swe_plot() drawn glyph by glyph (matplotlib) and rasterized
+    (datashader, rendered to a bokeh model) for an increasing number of pits,
+    and the TileCache of a zoomed view: first aggregation, then again from
+    the cached tiles
+    '''
+    import holoviews as hv
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    hv.extension('bokeh')
+    renderer = hv.renderer('bokeh')
+    rng = np.random.default_rng(seed)
+    # numba compiles the datashader kernels on first use
+    renderer.get_plot(sar_swe_plot(pd.DataFrame({'site_id': ['a'], 'swe': [1.0]}),
+                                   np.full((6, 1), -10.0), rasterize=True))
+
+    print(f'{"pits":>10} {"matplotlib [s]":>15} {"rasterized [s]":>15} {"zoom [s]":>10} {"cached [s]":>11}')
+    for n in sizes:
+        n = int(n)
+        pits = pd.DataFrame({'site_id': np.arange(n).astype(str), 'swe': rng.gamma(3, 80, n)})
+        mean = rng.normal(-10, 5, (6, n))
+
+        t_mpl = '-'
+        if n <= matplotlib_max:
+            t0 = time.perf_counter()
+            fig = sar_swe_plot(pits, mean.copy(), rasterize=False)
+            fig.canvas.draw()
+            plt.close(fig)
+            t_mpl = f'{time.perf_counter() - t0:.3f}'
+
+        t0 = time.perf_counter()
+        renderer.get_plot(sar_swe_plot(pits, mean, rasterize=True))
+        t_ras = time.perf_counter() - t0
+
+        tiles = TileCache(pits.assign(rank=np.arange(n)), 'rank', 'swe')
+        x_range = (0.4 * n, 0.5 * n)
+        t_zoom = _timeit(tiles.aggregate, x_range, None, 800, 500, repeat=1)
+        t_cached = _timeit(tiles.aggregate, x_range, None, 800, 500, repeat=1)
+        print(f'{n:>10d} {t_mpl:>15} {t_ras:>15.3f} {t_zoom:>10.3f} {t_cached:>11.4f}')
+
+
+# modules that should only be imported by the plotting functions
+PLOTTING_MODULES = ('matplotlib', 'holoviews', 'hvplot', 'bokeh', 'cartopy', 'datashader', 'panel')
+NN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'NN_with_Pytorch')
+# module -> directory it is imported from
+IMPORT_CHECKS = {'helper': os.path.dirname(os.path.abspath(__file__)),
+                 'campaign': os.path.dirname(os.path.abspath(__file__)),
+                 'utils': NN_DIR,
+                 'features': NN_DIR,
+                 'loader': NN_DIR}
+
+
+def _import_profile(module, path):
+    '''
+    import module in a fresh interpreter with -X importtime.
+
+    output
+        cumulative import time [ms], RSS added by the import [MiB] and the
+        plotting modules it pulled in
+    '''
+    # VmHWM is the peak RSS of this process image; ru_maxrss would include the
+    # parent's memory from before exec on linux
+    peak = ("(int(open('/proc/self/status').read().split('VmHWM:')[1].split()[0]) "
+            "if sys.platform == 'linux' else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+    code = (f'import resource, sys; sys.path.insert(0, {path!r}); rss = {peak}; import {module}; '
+            f'print(({peak} - rss) / 1024); '
+            'print(" ".join(sorted({m.split(".")[0] for m in sys.modules})))')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, check=True)
+    rss_line, modules_line = proc.stdout.split('\n')[:2]
+
+    # lines look like 'import time:   1234 |   5678 | module'
+    cumulative_us = 0
+    for line in proc.stderr.splitlines():
+        fields = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+    plotting = sorted(set(modules_line.split()) & set(PLOTTING_MODULES))
+    return cumulative_us / 1000, float(rss_line), plotting
+
+
+def bench_imports(budget_ms=500, budget_rss=64, repeat=3):
+    '''
+    import time and memory of the tutorial modules, for headless batch workers.
+
+    fails when a module takes longer than budget_ms [ms] (best of repeat fresh
+    interpreters) or adds more than budget_rss [MiB] to the interpreter, or 
+    when importing it loads a plotting library.
+    '''
+    failed = False
+    print(f'{"module":>10} {"import [ms]":>12} {"RSS [MiB]":>10}  plotting modules')
+    for module, path in IMPORT_CHECKS.items():
+        runs = [_import_profile(module, path) for _ in range(repeat)]
+        ms = min(r[0] for r in runs)
+        rss = min(r[1] for r in runs)
+        plotting = runs[0][2]
+        ok = ms <= budget_ms and rss <= budget_rss and not plotting
+        failed = failed or not ok
+        print(f'{module:>10} {ms:>12.1f} {rss:>10.1f}  {", ".join(plotting) or "-"}'
+              f'{"" if ok else "  <- over budget"}')
+    if failed:
+        raise SystemExit(1)
+
+
+# problem sizes of the benchmark suite
+SUITE_SIZES = {
+    'small':  {'raster': (6, 1000, 1000),   'samples': 2000,   'sites': 50},
+    'medium': {'raster': (6, 4000, 4000),   'samples': 20000,  'sites': 200},
+    'large':  {'raster': (6, 12000, 12000), 'samples': 200000, 'sites': 1000},
+}
+
+
+def write_sar_tifs(out_dir, shape=(6, 1000, 1000), tile=256, seed=0):
+    '''
+    write a synthetic SWESARR flight line: one tiled float32 GeoTIFF per band, 
+    named like the real tiles so join_files can parse them. written tile row by
+    tile row, so large rasters never sit in memory.
+    '''
+    import rasterio
+    from rasterio.transform import from_origin
+    from rasterio.windows import Window
+
+    rng = np.random.default_rng(seed)
+    nb, ny, nx = shape
+    paths = []
+    for band in ['09225VV', '09225VH', '13225VV', '13225VH', '17225VV', '17225VH'][:nb]:
+        path = os.path.join(out_dir, f'GRMCT2_31801_20007_016_200211_{band}_XX_01.tif')
+        profile = {'driver': 'GTiff', 'height': ny, 'width': nx, 'count': 1, 'dtype': 'float32',
+                   'crs': 'EPSG:32612', 'transform': from_origin(742000.0, 4330000.0, 1.0, 1.0),
+                   'tiled': True, 'blockxsize': tile, 'blockysize': tile, 'nodata': np.nan}
+        with rasterio.open(path, 'w', **profile) as dst:
+            for row in range(0, ny, tile):
+                h = min(tile, ny - row)
+                block = rng.uniform(-25, 0, (1, h, nx)).astype('float32')
+                dst.write(block, window=Window(0, row, nx, h))
+        paths.append(path)
+    return paths
+
+
+def write_radiom_csv(path, da, n=2000, seed=0):
+    '''
+    write a synthetic radiometer CSV in the SNEX20_SWESARR_TB column layout
+    '''
+    synthetic_radiom(da, n, seed).to_csv(path, index=False)
+    return path
+
+
+def _profile(func, *args, repeat=3, **kwargs):
+    '''
+    best-of-N wall time [s] and traced peak memory [MiB] of func(*args, **kwargs).
+    the memory run is separate, since tracing slows the call down.
+    '''
+    seconds = _timeit(func, *args, repeat=repeat, **kwargs)
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak / 2**20
+
+
+def bench_suite(sizes=('small', 'medium'), baseline=None, save=None, tolerance=1.3):
+    '''
+    time and memory-profile join_files, read_radiom, join_sar_radiom, 
+    filt_pit_to_sar and filt_radiom_points on synthetic inputs of several sizes.
+
+    input
+        sizes     - keys of SUITE_SIZES
+        baseline  - JSON file of an earlier run to compare against
+        save      - JSON file to store this run in (a new baseline)
+        tolerance - a case regresses when its time or peak memory exceeds the 
+                    baseline by this factor
+    '''
+    results = {}
+    print(f'{"case":>32} {"time [s]":>10} {"peak [MiB]":>11}')
+    for size in sizes:
+        cfg = SUITE_SIZES[size]
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = write_sar_tifs(tmp, cfg['raster'])
+            da = join_files(paths)
+            csv = write_radiom_csv(os.path.join(tmp, 'SNEX20_SWESARR_TB_synthetic.csv'), da, cfg['samples'])
+            radiom = read_radiom(csv, cache=False)
+            extent = min(cfg['raster'][1:]) * 1.0
+            pits = synthetic_pits(n_sites=cfg['sites'], extent=extent)
+            point_swe_filt, _ = filt_pit_to_sar(pits, da, 3)
+
+            cases = {
+                'join_files': lambda: join_files(paths).load(),
+                'read_radiom': lambda: read_radiom(csv, cache=False),
+                'join_sar_radiom': lambda: join_sar_radiom(da, radiom, method='transform'),
+                'filt_pit_to_sar': lambda: filt_pit_to_sar(pits, da, 3),
+                'filt_radiom_points': lambda: filt_radiom_points(496, 282, 144, radiom, point_swe_filt),
+            }
+            for name, case in cases.items():
+                seconds, peak = _profile(case)
+                key = f'{name}[{size}]'
+                results[key] = {'time_s': seconds, 'peak_mib': peak}
+                print(f'{key:>32} {seconds:>10.4f} {peak:>11.1f}')
+
+    if save:
+        with open(save, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'results': results}, f, indent=1)
+        print(f'baseline written to {save}')
+
+    if baseline:
+        with open(baseline) as f:
+            base = json.load(f)['results']
+        regressions = []
+        for key, cur in results.items():
+            if key not in base:
+                continue
+            for metric in ('time_s', 'peak_mib'):
+                if cur[metric] > tolerance * base[key][metric]:
+                    regressions.append(f'{key} {metric}: {base[key][metric]:.4g} -> {cur[metric]:.4g}')
+        if regressions:
+            print('regressions against', baseline)
+            print('\n'.join('  ' + r for r in regressions))
+            raise SystemExit(1)
+        print(f'no regressions against {baseline} (tolerance x{tolerance})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmark', choices=['suite', 'colocate', 'reproject', 'pits', 'boxes', 'footprints',
+                                              'transformer', 'outofcore', 'imports', 'plots'])
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=list(SUITE_SIZES),
+                        help='problem sizes for suite')
+    parser.add_argument('--save-baseline', default=None, help='store suite results in this JSON file')
+    parser.add_argument('--compare', default=None, help='compare suite results with this JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=1.3,
+                        help='allowed slowdown / memory growth factor for --compare')
+    parser.add_argument('--shape', type=int, nargs=3, default=None,
+                        help='synthetic raster size (band, y, x) for reproject / outofcore')
+    parser.add_argument('--max-rss', type=float, default=16,
+                        help='memory cap [GiB] (address space) for outofcore')
+    parser.add_argument('--tmp-dir', default=None,
+                        help='where outofcore writes its GeoTIFFs (default: the system temp dir)')
+    parser.add_argument('--import-ms', type=float, default=500,
+                        help='import time budget per module [ms] for imports')
+    parser.add_argument('--import-rss', type=float, default=64,
+                        help='memory budget per module import [MiB] for imports')
+    args = parser.parse_args()
+
+    if args.benchmark == 'suite':
+        bench_suite(args.sizes, baseline=args.compare, save=args.save_baseline,
+                    tolerance=args.tolerance)
+    elif args.benchmark == 'colocate':
+        bench_colocate()
+    elif args.benchmark == 'reproject':
+        bench_reproject(tuple(args.shape or (6, 12000, 12000)))
+    elif args.benchmark == 'pits':
+        bench_pits()
+    elif args.benchmark == 'boxes':
+        bench_boxes()
+    elif args.benchmark == 'footprints':
+        bench_footprints()
+    elif args.benchmark == 'transformer':
+        bench_transformer()
+    elif args.benchmark == 'outofcore':
+        bench_out_of_core(tuple(args.shape or (6, 30000, 30000)), max_rss=args.max_rss,
+                          tmp_dir=args.tmp_dir)
+    elif args.benchmark == 'imports':
+        bench_imports(args.import_ms, args.import_rss)
+    elif args.benchmark == 'plots':
+        bench_plots()
@@ -0,0 +1,254 @@
+'''
+campaign-level driver for the SWESARR helpers.
+
+runs join_files + join_sar_radiom (and optionally filt_pit_to_sar /
+filt_radiom_points) for every flight line of a campaign on a pool of worker
+processes, writing each line's results to Parquet as soon as it finishes.
+radiometer samples are co-located with join_sar_radiom(method='transform'),
+which skips the raster reprojection (values can differ from the tutorial's
+default 'reproject' by a pixel).
+
+flight lines come from either
+    - a directory with one sub-directory per flight line, each holding the
+      six SAR GeoTIFFs and one radiometer CSV (SNEX20_SWESARR_TB_*.csv), or
+    - a CSV manifest with columns line, radiom and sar, where sar is a glob
+      pattern or a ';' separated list of GeoTIFF paths.
+
+usage (from the util directory):
+    python campaign.py /data/swesarr/GRMCT2 /tmp/swesarr_out --workers 8
+    python campaign.py manifest.csv /tmp/swesarr_out --scheduler dask --pits pits.parquet
+    python campaign.py /data/swesarr/GRMCT2 /tmp/swesarr_out --profile
+
+with --profile every flight line also gets profile.json (nested stage timings,
+memory, dask tasks and bytes read, see helper.Profiler) and profile.folded 
+(for flamegraph.pl / speedscope).
+'''
+import argparse
+import contextlib
+import glob
+import os
+import resource
+import time
+
+from helper import Profiler, join_files, join_sar_radiom, filt_pit_to_sar, filt_radiom_points, read_radiom
+
+
+def find_flight_lines(source):
+    '''
+    list the flight lines of a campaign.
+
+    input
+        source - campaign directory or path to a CSV manifest
+    output
+        list of dictionaries with keys line (name), radiom (CSV path) and
+        sar (sorted list of GeoTIFF paths)
+    '''
+    import pandas as pd
+
+    lines = []
+    if os.path.isdir(source):
+        for line_dir in sorted(glob.glob(os.path.join(source, '*', ''))):
+            sar = sorted(glob.glob(line_dir + '*.tif'))
+            radiom = sorted(glob.glob(line_dir + '*.csv'))
+            if not sar or not radiom:
+                print(f'skipping {line_dir}: expected SAR tiles and a radiometer CSV')
+                continue
+            lines.append({'line': os.path.basename(os.path.normpath(line_dir)),
+                          'radiom': radiom[0], 'sar': sar})
+    else:
+        manifest = pd.read_csv(source, dtype=str)
+        for row in manifest.itertuples(index=False):
+            if ';' in row.sar:
+                sar = [f.strip() for f in row.sar.split(';')]
+            else:
+                sar = sorted(glob.glob(row.sar))
+            lines.append({'line': row.line, 'radiom': row.radiom, 'sar': sar})
+
+    return lines
+
+
+def _reset_peak_rss():
+    '''
+    reset the peak RSS of this process (linux: write 5 to /proc/self/clear_refs),
+    so a reused pool worker reports the peak of one flight line. False when not
+    supported; the peak is then the lifetime peak of the worker.
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mib():
+    '''
+    peak RSS [MiB] since the last _reset_peak_rss (VmHWM), ru_maxrss without /proc
+    '''
+    try:
+        with open('/proc/self/status') as f:
+            for row in f:
+                if row.startswith('VmHWM:'):
+                    return int(row.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def process_flight_line(line, out_dir, pits=None, box_size=3, footprints=(496, 282, 144),
+                        threads=1, profile=False):
+    '''
+    co-locate one flight line and write its products to out_dir/<line>/.
+
+    input
+        line       - dictionary from find_flight_lines()
+        out_dir    - root output directory
+        pits       - optional GeoParquet file of snowexsql density layers. when given,
+                     the pit / SAR / radiometer products are written as well
+        box_size   - averaging square about each snow pit [meter]
+        footprints - semi-major axes of the 10 / 18 / 37 GHz footprints [meter]
+        threads    - dask threads used inside this worker (1 = synchronous)
+        profile    - also write profile.json / profile.folded for this line
+    output
+        summary dictionary (line, rows, wall time, worker pid, peak RSS [MiB], files).
+        peak_rss_scope is 'line' when the peak is this line's alone, 'process' when it
+        could not be reset and covers everything the worker ran before
+    '''
+    import dask
+
+    per_line = _reset_peak_rss()
+    t0 = time.perf_counter()
+    line_dir = os.path.join(out_dir, line['line'])
+    os.makedirs(line_dir, exist_ok=True)
+    written = []
+
+    # keep dask from oversubscribing the cores the pool already uses
+    scheduler = {'scheduler': 'synchronous'} if threads == 1 else \
+                {'scheduler': 'threads', 'num_workers': threads}
+    profiler = Profiler(name=line['line']) if profile else contextlib.nullcontext()
+    with dask.config.set(**scheduler), profiler:
+        da = join_files(line['sar'])
+        radiom = read_radiom(line['radiom'], cache_dir=line_dir)
+
+        _, out_data = join_sar_radiom(da, radiom, method='transform', plot=None)
+        out_path = os.path.join(line_dir, 'colocated.parquet')
+        out_data.to_parquet(out_path)
+        written.append(out_path)
+
+        if pits is not None:
+            import geopandas as gpd
+
+            snow_pits = gpd.read_parquet(pits)
+            point_swe_filt, swesarr_mean = filt_pit_to_sar(snow_pits, da, box_size)
+            for band, mean in zip(da['band'].values, swesarr_mean):
+                point_swe_filt[f'{band} SAR'] = mean
+            rad_swe = filt_radiom_points(*footprints, radiom, point_swe_filt)
+
+            for name, frame in (('pit_sar', point_swe_filt), ('pit_radiom', rad_swe)):
+                out_path = os.path.join(line_dir, name + '.parquet')
+                frame.to_parquet(out_path)
+                written.append(out_path)
+
+    if profile:
+        for name, save in (('profile.json', profiler.save), ('profile.folded', profiler.save_folded)):
+            save(os.path.join(line_dir, name))
+            written.append(os.path.join(line_dir, name))
+
+    return {'line': line['line'], 'rows': len(out_data),
+            'wall_s': time.perf_counter() - t0, 'pid': os.getpid(),
+            'peak_rss_mib': _peak_rss_mib(), 'peak_rss_scope': 'line' if per_line else 'process',
+            'files': written}
+
+
+def run_campaign(source, out_dir, workers=None, scheduler='process', **kwargs):
+    '''
+    process every flight line of a campaign in parallel.
+
+    input
+        source    - campaign directory or CSV manifest (see find_flight_lines)
+        out_dir   - root output directory, one sub-directory per flight line
+        workers   - number of worker processes (default: number of CPUs)
+        scheduler - 'process' for a concurrent.futures process pool,
+                    'dask' for a dask.distributed LocalCluster
+        kwargs    - passed on to process_flight_line (pits, box_size, footprints, threads, profile)
+    output
+        pandas dataframe with one summary row per flight line. a line that raised is
+        recorded with its error (the other lines keep going)
+    '''
+    import pandas as pd
+
+    lines = find_flight_lines(source)
+    workers = workers or os.cpu_count()
+    os.makedirs(out_dir, exist_ok=True)
+    print(f'{len(lines)} flight lines, {workers} {scheduler} workers')
+
+    summaries = []
+    t0 = time.perf_counter()
+
+    def report(future, line):
+        try:
+            summary = future.result()
+        except Exception as err: # e.g. a corrupt tile or CSV: record it, keep going
+            summary = {'line': line['line'], 'error': f'{type(err).__name__}: {err}'}
+        summaries.append(summary)
+        if 'error' in summary:
+            print(f"[{len(summaries)}/{len(lines)}] {summary['line']}: FAILED {summary['error']}")
+        else:
+            print(f"[{len(summaries)}/{len(lines)}] {summary['line']}: {summary['rows']} samples "
+                  f"in {summary['wall_s']:.1f} s")
+
+    if scheduler == 'process':
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(process_flight_line, line, out_dir, **kwargs): line for line in lines}
+            for future in as_completed(futures):
+                report(future, futures[future])
+    elif scheduler == 'dask':
+        from dask.distributed import Client, LocalCluster, as_completed
+
+        with LocalCluster(n_workers=workers, threads_per_worker=1, processes=True) as cluster, \
+             Client(cluster) as client:
+            futures = {client.submit(process_flight_line, line, out_dir, pure=False, **kwargs): line
+                       for line in lines}
+            for future in as_completed(list(futures)):
+                report(future, futures[future])
+    else:
+        raise ValueError(f"unknown scheduler '{scheduler}', use 'process' or 'dask'")
+
+    elapsed = time.perf_counter() - t0
+    summary = pd.DataFrame(summaries)
+    failed = summary['error'].notna() if 'error' in summary else pd.Series(False, index=summary.index)
+    done = summary[~failed]
+    print(f'\n{len(done)} lines in {elapsed:.1f} s ({len(done) / elapsed:.3f} lines/s), '
+          f'{int(failed.sum())} failed')
+    if len(done):
+        scope = 'per flight line' if (done['peak_rss_scope'] == 'line').all() else 'per worker (lifetime)'
+        print(f'peak RSS {scope} [MiB]: median {done["peak_rss_mib"].median():.0f}, '
+              f'max {done["peak_rss_mib"].max():.0f}')
+    for row in summary[failed].itertuples():
+        print(f'  failed {row.line}: {row.error}')
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='campaign directory or CSV manifest')
+    parser.add_argument('out_dir', help='output directory')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--scheduler', choices=['process', 'dask'], default='process')
+    parser.add_argument('--threads', type=int, default=1, help='dask threads per worker')
+    parser.add_argument('--pits', default=None, help='GeoParquet file of snow pit density layers')
+    parser.add_argument('--box-size', type=float, default=3)
+    parser.add_argument('--footprints', type=float, nargs=3, default=(496, 282, 144),
+                        help='10 / 18 / 37 GHz footprint semi-major axes [meter]')
+    parser.add_argument('--profile', action='store_true',
+                        help='write profile.json / profile.folded for every flight line')
+    args = parser.parse_args()
+
+    summary = run_campaign(args.source, args.out_dir, workers=args.workers, scheduler=args.scheduler,
+                           pits=args.pits, box_size=args.box_size, footprints=tuple(args.footprints),
+                           threads=args.threads, profile=args.profile)
+    if 'error' in summary and summary['error'].notna().any():
+        raise SystemExit(1)
@@ -1,5 +1,9 @@
+import contextlib
+import functools
+import re
+import time
+
 import numpy as np
-import matplotlib.pyplot as plt
 
 def cosd(a):
     return np.cos( a * np.pi/180 )
@@ -8,39 +12,671 @@ def sind(a):
 def tand(a):
     return np.tan( a * np.pi/180 )
 
-def get_out_dir():
+# ---------------------------------------------------------------------------
+# opt-in profiling. nothing is recorded (and nothing imported) unless a
+# Profiler is active; the helpers below are wrapped with @profiled or open a
+# stage() for their internal steps.
+
+_ACTIVE_PROFILER = None
+
+def _bytes_read():
+    '''
+    bytes read by this process so far (read syscalls, /proc/self/io), None off linux.
+    '''
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+class _Stage:
+    '''
+    one node of the profile tree. calls of the same stage under the same parent
+    are merged (calls counts them).
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_bytes = 0
+        self.dask_graphs = 0
+        self.dask_tasks = 0
+        self.bytes_read = 0
+        self.children = {}
+
+    def child(self, name):
+        if name not in self.children:
+            self.children[name] = _Stage(name)
+        return self.children[name]
+
+    def to_dict(self):
+        children = [c.to_dict() for c in self.children.values()]
+        return {'name': self.name, 'calls': self.calls,
+                'wall_s': self.wall_s, 'cpu_s': self.cpu_s,
+                'self_s': max(self.wall_s - sum(c['wall_s'] for c in children), 0.0),
+                'peak_mib': self.peak_bytes / 2**20,
+                'dask_graphs': self.dask_graphs, 'dask_tasks': self.dask_tasks,
+                'read_mib': self.bytes_read / 2**20,
+                'children': children}
+
+class Profiler:
+    '''
+    record wall time, CPU time, peak traced memory, dask graphs / tasks and bytes
+    read for the SWESARR helpers and their internal stages.
+
+    usage
+        with Profiler() as prof:
+            da = join_files(files)
+            data_p, out_data = join_sar_radiom(da, radiom)
+        prof.print()
+        prof.save('profile.json')          # nested stages, to compare runs over time
+        prof.save_folded('profile.folded') # for flamegraph.pl / speedscope
+
+    input
+        trace_memory - track peak Python memory with tracemalloc (slows numpy-light
+                       code down a little; the numbers are per stage, above the
+                       memory in use when the stage started)
+        name         - name of the root stage
+
+    notes
+        dask tasks are counted with a dask callback, so only the local (threaded /
+        synchronous) schedulers are seen. bytes read come from /proc/self/io and
+        include all threads (GDAL reads inside dask workers too); None off linux.
+    '''
+    def __init__(self, trace_memory=True, name='total'):
+        self.trace_memory = trace_memory
+        self.root = _Stage(name)
+        self._stack = []
+        self._dask_callback = None
+
+    def __enter__(self):
+        global _ACTIVE_PROFILER
+        import tracemalloc
+
+        if _ACTIVE_PROFILER is not None:
+            raise RuntimeError('a Profiler is already active')
+        self._started_tracemalloc = self.trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+        try:
+            from dask.callbacks import Callback
+        except ImportError:
+            pass
+        else:
+            def count(dsk):
+                stage = self._stack[-1][0]
+                stage.dask_graphs += 1
+                stage.dask_tasks += len(dsk)
+            self._dask_callback = Callback(start=count)
+            self._dask_callback.register()
+        _ACTIVE_PROFILER = self
+        self._enter(self.root)
+        return self
+
+    def __exit__(self, *exc):
+        global _ACTIVE_PROFILER
+        import tracemalloc
+
+        self._exit()
+        _ACTIVE_PROFILER = None
+        if self._dask_callback is not None:
+            self._dask_callback.unregister()
+            self._dask_callback = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        return False
+
+    def _enter(self, stage):
+        import tracemalloc
+
+        # the peak so far belongs to the enclosing stage; then start a new peak
+        if self._stack and tracemalloc.is_tracing():
+            parent = self._stack[-1]
+            parent[4] = max(parent[4], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        # stage, wall, cpu, bytes read, running traced peak, traced at start
+        self._stack.append([stage, time.perf_counter(), time.process_time(),
+                            _bytes_read(), traced, traced])
+
+    def _exit(self):
+        import tracemalloc
+
+        stage, wall, cpu, read, peak, start = self._stack.pop()
+        stage.calls += 1
+        stage.wall_s += time.perf_counter() - wall
+        stage.cpu_s += time.process_time() - cpu
+        if read is not None:
+            stage.bytes_read += _bytes_read() - read
+        if tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            stage.peak_bytes = max(stage.peak_bytes, peak - start)
+            if self._stack:
+                parent = self._stack[-1]
+                parent[4] = max(parent[4], peak)
+                tracemalloc.reset_peak()
+
+    def stage(self, name):
+        self._enter(self._stack[-1][0].child(name))
+
+    def report(self):
+        '''
+        nested dictionary of all stages (wall_s, cpu_s, self_s, peak_mib, dask_graphs,
+        dask_tasks, read_mib, calls, children). the root is only complete once the
+        profiler has exited.
+        '''
+        return self.root.to_dict()
+
+    def save(self, path):
+        import json
+        import platform
+
+        with open(path, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'profile': self.report()},
+                      f, indent=1)
+
+    def folded(self):
+        '''
+        stack lines 'total;join_sar_radiom;extract_points <self time [us]>' for
+        flamegraph.pl, speedscope or inferno.
+        '''
+        lines = []
+        def walk(node, prefix):
+            path = f"{prefix};{node['name']}" if prefix else node['name']
+            if node['self_s'] > 0:
+                lines.append(f"{path} {int(round(node['self_s'] * 1e6))}")
+            for child in node['children']:
+                walk(child, path)
+        walk(self.report(), '')
+        return '\n'.join(lines) + '\n'
+
+    def save_folded(self, path):
+        with open(path, 'w') as f:
+            f.write(self.folded())
+
+    def print(self):
+        print(f'{"stage":<40} {"calls":>6} {"wall [s]":>9} {"self [s]":>9} {"cpu [s]":>9} '
+              f'{"peak [MiB]":>11} {"tasks":>7} {"read [MiB]":>11}')
+        def walk(node, depth):
+            print(f"{'  ' * depth + node['name']:<40} {node['calls']:>6} {node['wall_s']:>9.3f} "
+                  f"{node['self_s']:>9.3f} {node['cpu_s']:>9.3f} {node['peak_mib']:>11.1f} "
+                  f"{node['dask_tasks']:>7} {node['read_mib']:>11.1f}")
+            for child in node['children']:
+                walk(child, depth + 1)
+        walk(self.report(), 0)
+
+@contextlib.contextmanager
+def stage(name):
+    '''
+    record the enclosed block as a stage of the active Profiler (no-op without one).
+    '''
+    profiler = _ACTIVE_PROFILER
+    if profiler is None:
+        yield
+        return
+    profiler.stage(name)
+    try:
+        yield
+    finally:
+        profiler._exit()
+
+def profiled(func):
+    '''
+    decorator: record every call of func as a stage of the active Profiler.
+    '''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _ACTIVE_PROFILER is None:
+            return func(*args, **kwargs)
+        with stage(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def prepare_scratch(src_dir, scratch_dir, quota_bytes=None, writable=()):
+    '''
+    bring the files of src_dir into scratch_dir without redundant copies.
+
+    files already up to date in scratch_dir (same size, not older) are skipped. 
+    new or changed files are hard-linked when both directories share a file 
+    system, and copied otherwise, provided there is enough free space. when 
+    quota_bytes is given, the least recently used top-level files of scratch_dir 
+    that don't come from src_dir are removed until the directory fits the quota.
+
+    a hard link is the same file as the one in src_dir: linked files are read-only
+    inputs. writing into one in place (e.g. wget -O, open(..., 'w')) changes the
+    file in src_dir too, so remove it first, or list it in writable (file name
+    patterns, e.g. ('*.csv',)) to always get a copy.
+
+    output
+        dictionary with counts and bytes of skipped / linked / copied / removed files
+        and an estimate of the copy time saved [s]
+    '''
+    import os
+    import shutil
+    from fnmatch import fnmatch
+
+    os.makedirs(scratch_dir, exist_ok=True)
+    stats = {'skipped': 0, 'linked': 0, 'copied': 0, 'removed': 0, 'no_space': 0,
+             'bytes_skipped': 0, 'bytes_linked': 0, 'bytes_copied': 0, 'bytes_removed': 0}
+    copy_s = 0.0
+
+    src_names = set()
+    for entry in os.scandir(src_dir):
+        if not entry.is_file():
+            continue
+        src_names.add(entry.name)
+        src_st = entry.stat()
+        dst = os.path.join(scratch_dir, entry.name)
+        copy_only = any(fnmatch(entry.name, p) for p in writable)
+
+        if os.path.exists(dst):
+            dst_st = os.stat(dst)
+            # a writable file must not still be a link from an earlier run
+            shared = dst_st.st_ino == src_st.st_ino and dst_st.st_dev == src_st.st_dev
+            if (dst_st.st_size == src_st.st_size and dst_st.st_mtime >= src_st.st_mtime
+                    and not (copy_only and shared)):
+                stats['skipped'] += 1
+                stats['bytes_skipped'] += src_st.st_size
+                continue
+            os.remove(dst)
+
+        if not copy_only:
+            try:
+                os.link(entry.path, dst)
+                stats['linked'] += 1
+                stats['bytes_linked'] += src_st.st_size
+                continue
+            except OSError:
+                pass # different file system (or links not allowed): copy instead
+
+        if shutil.disk_usage(scratch_dir).free < src_st.st_size:
+            print(f'not enough space in {scratch_dir} for {entry.name}, leaving it out')
+            stats['no_space'] += 1
+            continue
+        t0 = time.perf_counter()
+        shutil.copy2(entry.path, dst)
+        copy_s += time.perf_counter() - t0
+        stats['copied'] += 1
+        stats['bytes_copied'] += src_st.st_size
+
+    if quota_bytes is not None:
+        # top-level files only: sub-directories (e.g. a ResultCache) manage themselves
+        others = [e for e in os.scandir(scratch_dir) if e.is_file() and e.name not in src_names]
+        total = sum(e.stat().st_size for e in os.scandir(scratch_dir) if e.is_file())
+        for e in sorted(others, key=lambda e: e.stat().st_atime):
+            if total <= quota_bytes:
+                break
+            size = e.stat().st_size
+            os.remove(e.path)
+            total -= size
+            stats['removed'] += 1
+            stats['bytes_removed'] += size
+
+    # time saved, at the copy speed seen here (or a conservative 200 MB/s)
+    speed = stats['bytes_copied'] / copy_s if copy_s > 0 else 200e6
+    stats['saved_s'] = (stats['bytes_skipped'] + stats['bytes_linked']) / speed
+    return stats
+
+
+def _out_dir_path():
+    '''
+    (data directory, scratch directory or None) as chosen by get_out_dir, without
+    creating or staging anything
+    '''
+    import platform, getpass, os
+
+    output_dir = os.getcwd() + '/data/'
+    scratch = os.environ.get('SNOWEX_SCRATCH')
+    if scratch is None and platform.system().lower() == 'linux':
+        scratch = '/tmp/'
+    if scratch is None:
+        return output_dir, None
+    # one directory per user, so shared JupyterHub nodes don't step on each other
+    return output_dir, os.path.join(scratch, f'snowex-{getpass.getuser()}') + '/'
+
+def get_out_dir(quota_bytes=None, verbose=True, writable=('*.csv',)):
     '''
     choose an output directory based on operating system.
 
     for remote linux servers, the /tmp directory may use SSDs for faster read/write speeds.
     when running on windows, simply store in the local directory
+
+    the SNOWEX_SCRATCH environment variable overrides the scratch location on any 
+    system. scratch space is split into per-user sub-directories, and files from 
+    ./data/ are only linked / copied when they changed (see prepare_scratch).
+    quota_bytes (or SNOWEX_SCRATCH_QUOTA, in bytes) caps the size of the user's 
+    scratch directory. linked files are shared with ./data/ and must not be written
+    in place; files matching writable (the radiometer CSVs the tutorial downloads
+    with wget -O) are copied instead.
     '''
-    import platform, shutil, glob, os
+    import os
     
     # git repo should include a small CSV of data by default. this will either be the
-    # output directory or be copied to /tmp/ if linux
-    output_dir = os.getcwd() + '/data/'
-    try:
-        os.makedirs(output_dir)
-    except FileExistsError:
-        print('output directory prepared!')
-
-    # linux operations
-    cur_sys = platform.system()
-    if cur_sys.lower() == 'linux':
-        tmp_dir = '/tmp/'
-
-        # copy any files that may exist 
-        cur_files = glob.glob(output_dir + '*')
-        for file in cur_files:
-            shutil.copy2(file, tmp_dir)
-        # change output directory to /tmp/
-        output_dir = tmp_dir
+    # output directory or be brought to /tmp/ if linux
+    output_dir, scratch_dir = _out_dir_path()
+    os.makedirs(output_dir, exist_ok=True)
+    if scratch_dir is None:
+        return output_dir
+
+    if quota_bytes is None and os.environ.get('SNOWEX_SCRATCH_QUOTA'):
+        quota_bytes = int(float(os.environ['SNOWEX_SCRATCH_QUOTA']))
+
+    stats = prepare_scratch(output_dir, scratch_dir, quota_bytes, writable)
+    if verbose:
+        print(f"output directory {scratch_dir}: "
+              f"{stats['copied']} copied ({stats['bytes_copied'] / 1e6:.1f} MB), "
+              f"{stats['linked']} linked, {stats['skipped']} up to date, "
+              f"{stats['removed']} removed, ~{stats['saved_s']:.1f} s saved")
     
-    return output_dir
+    return scratch_dir
         
         
 
+def _is_geodataframe(frame):
+    try:
+        import geopandas as gpd
+    except ImportError: # without geopandas there are no GeoDataFrames either
+        return False
+    return isinstance(frame, gpd.GeoDataFrame)
+
+class ResultCache:
+    '''
+    content-addressed, size-bounded cache of intermediate SWESARR products on disk.
+
+    results are keyed on the function (its module, name and the source file defining
+    it), the content of the input files and the function arguments, so rerunning a notebook with unchanged inputs loads the
+    previous results instead of recomputing them. tables are stored as Parquet,
+    rasters (xarray.DataArray) as Zarr and other arrays as .npy. the least recently
+    used entries are deleted once the cache grows beyond max_bytes.
+
+    example
+        cache = ResultCache()
+        sar_data = cache.call(join_files, output_paths, files=output_paths)
+        sar_geo = cache.call(sar_data.rio.reproject, "EPSG:4326", files=output_paths)
+        data_p, out_data = cache.call(join_sar_radiom, sar_data, radiom, 
+                                      files=output_paths, params={'da': 'join_files(output_paths)'})
+        print(cache.stats())
+    '''
+
+    def __init__(self, root=None, max_bytes=10 * 2**30):
+        import os
+
+        if root is None:
+            # same place as get_out_dir(), without staging ./data into it
+            output_dir, scratch_dir = _out_dir_path()
+            root = os.path.join(scratch_dir or output_dir, 'swesarr_cache')
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+        self._file_hashes = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def file_hash(self, filename, block_size=2**22):
+        '''
+        sha256 of a file's content. memoized on (path, size, mtime), so large rasters
+        are only read again after they change.
+        '''
+        import hashlib
+        import os
+
+        st = os.stat(filename)
+        stamp = (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+        if stamp not in self._file_hashes:
+            digest = hashlib.sha256()
+            with open(filename, 'rb') as f:
+                for block in iter(lambda: f.read(block_size), b''):
+                    digest.update(block)
+            self._file_hashes[stamp] = digest.hexdigest()
+        return self._file_hashes[stamp]
+
+    def key(self, name, files=(), **params):
+        '''
+        cache key of a result: function name (or func_id), input file contents and parameters.
+        parameters must be representable as text (numbers, strings, lists, ...).
+        '''
+        import hashlib
+        import json
+
+        content = {'name': name, 
+                   'files': [self.file_hash(f) for f in files],
+                   'params': {k: repr(v) for k, v in sorted(params.items())}}
+        return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+    def func_id(self, func):
+        '''
+        identity of a function for the key: module, qualified name and the content of
+        the file defining it (so editing e.g. helper.py drops its cached results).
+        lambdas and other local functions also get their own source.
+        '''
+        import inspect
+
+        func = getattr(func, '__func__', func) # bound method -> function
+        name = getattr(func, '__qualname__', getattr(func, '__name__', repr(func)))
+        ident = {'module': getattr(func, '__module__', None), 'name': name}
+        try:
+            ident['file'] = self.file_hash(inspect.getsourcefile(inspect.unwrap(func)))
+        except (TypeError, OSError): # builtins, interactively defined functions
+            pass
+        if '<' in name: # <lambda>, <locals>: the name alone does not tell them apart
+            try:
+                ident['source'] = inspect.getsource(func)
+            except (TypeError, OSError):
+                code = getattr(func, '__code__', None)
+                ident['source'] = repr((code.co_code, code.co_consts)) if code else repr(func)
+        return ident
+
+    @staticmethod
+    def _content_hash(value):
+        '''
+        sha256 of the content of a pandas object or numpy array, None for other values
+        '''
+        import hashlib
+        import pandas as pd
+
+        digest = hashlib.sha256()
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            names = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+            digest.update(repr((type(value).__name__, names, list(np.atleast_1d(value.dtypes)))).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            digest.update(repr((value.shape, value.dtype.str)).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            return None
+        return digest.hexdigest()
+
+    @staticmethod
+    def _keyable(value):
+        '''
+        True for values that are hashed into the key by their repr: scalars, strings
+        and tuples / lists / dicts of those
+        '''
+        if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+            return True
+        if isinstance(value, (tuple, list)):
+            return all(ResultCache._keyable(v) for v in value)
+        if isinstance(value, dict):
+            return all(ResultCache._keyable(k) and ResultCache._keyable(v) for k, v in value.items())
+        return False
+
+    def call(self, func, *args, files=(), params=None, **kwargs):
+        '''
+        return func(*args, **kwargs), loading it from the cache when possible.
+
+        input
+            func   - function producing a dataframe, DataArray, numpy array or a tuple of those
+            args   - positional arguments of func
+            files  - input files the result depends on
+            params - extra values identifying the inputs (e.g. a database query)
+            kwargs - keyword arguments of func
+
+        arguments of func that are scalars, strings or tuples of those are part of the
+        key, dataframes and numpy arrays by a hash of their content. other arguments
+        (e.g. lazy DataArrays) have to be described by a params entry of the same
+        name, otherwise a TypeError is raised.
+        '''
+        import inspect
+        import os
+        import time
+
+        ident = self.func_id(func)
+        name = ident['name']
+        try:
+            arguments = inspect.signature(func).bind(*args, **kwargs).arguments
+        except ValueError: # no signature (some builtins)
+            arguments = {f'arg{ii}': a for ii, a in enumerate(args)}
+            arguments.update(kwargs)
+
+        key_params = dict(params or {})
+        for arg_name, value in arguments.items():
+            if arg_name in key_params: # described by the caller
+                continue
+            if self._keyable(value):
+                key_params['arg.' + arg_name] = value
+                continue
+            digest = self._content_hash(value)
+            if digest is None:
+                raise TypeError(f'{name}: argument {arg_name!r} ({type(value).__name__}) cannot be '
+                                'hashed; describe it with params={' + repr(arg_name) + ': ...}')
+            key_params['arg.' + arg_name] = digest
+        key = self.key(ident, files, **key_params)
+        entry = os.path.join(self.root, key)
+
+        if os.path.isdir(entry):
+            t0 = time.perf_counter()
+            result, meta = self._load(entry)
+            self.hits += 1
+            self.saved_s += max(0.0, meta['compute_s'] - (time.perf_counter() - t0))
+            os.utime(entry) # mark as recently used
+            return result
+
+        self.misses += 1
+        t0 = time.perf_counter()
+        result = func(*args, **kwargs)
+        self._store(entry, result, time.perf_counter() - t0)
+        self.evict()
+        return result
+
+    def _store(self, entry, result, compute_s):
+        import json
+        import os
+        import shutil
+        import pandas as pd
+        import xarray as xr
+
+        # write next to the final location, then rename, so readers never see half an entry
+        tmp = entry + f'.{os.getpid()}.tmp'
+        os.makedirs(tmp, exist_ok=True)
+        parts = result if isinstance(result, tuple) else (result,)
+        kinds = []
+        crs_wkt = {}
+        for ii, part in enumerate(parts):
+            path = os.path.join(tmp, f'part{ii}')
+            if isinstance(part, pd.DataFrame):
+                part.to_parquet(path + '.parquet')
+                kinds.append('geoparquet' if _is_geodataframe(part) else 'parquet')
+            elif isinstance(part, xr.DataArray):
+                part.to_dataset(name='data').to_zarr(path + '.zarr', mode='w')
+                kinds.append('zarr')
+                # the CRS lives in rioxarray's encoding, which zarr does not round-trip
+                crs = part.rio.crs if hasattr(part, 'rio') else None
+                crs_wkt[ii] = crs.to_wkt() if crs is not None else None
+            elif part is None:
+                kinds.append('none')
+            else:
+                np.save(path + '.npy', np.asarray(part))
+                kinds.append('npy')
+
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'kinds': kinds, 'tuple': isinstance(result, tuple), 
+                       'compute_s': compute_s, 'crs': crs_wkt}, f)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # another process stored the same result first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _load(self, entry):
+        import json
+        import os
+        import pandas as pd
+        import xarray as xr
+
+        with open(os.path.join(entry, 'meta.json')) as f:
+            meta = json.load(f)
+
+        parts = []
+        for ii, kind in enumerate(meta['kinds']):
+            path = os.path.join(entry, f'part{ii}')
+            if kind == 'parquet':
+                parts.append(pd.read_parquet(path + '.parquet'))
+            elif kind == 'geoparquet':
+                import geopandas as gpd
+                parts.append(gpd.read_parquet(path + '.parquet'))
+            elif kind == 'zarr':
+                part = xr.open_zarr(path + '.zarr', decode_coords='all')['data']
+                crs = meta['crs'].get(str(ii))
+                if crs is not None:
+                    import rioxarray # noqa: F401, registers the .rio accessor
+                    part = part.rio.write_crs(crs)
+                parts.append(part)
+            elif kind == 'none':
+                parts.append(None)
+            else:
+                parts.append(np.load(path + '.npy'))
+
+        return (tuple(parts) if meta['tuple'] else parts[0]), meta
+
+    def entries(self):
+        '''
+        list of (path, size [bytes], last use) of all cache entries, oldest first
+        '''
+        import os
+
+        out = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path) or name.endswith('.tmp'):
+                continue
+            size = sum(os.path.getsize(os.path.join(d, f))
+                       for d, _, fs in os.walk(path) for f in fs)
+            out.append((path, size, os.path.getmtime(path)))
+        return sorted(out, key=lambda e: e[2])
+
+    def evict(self):
+        '''
+        delete least recently used entries until the cache fits in max_bytes
+        '''
+        import shutil
+
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        import shutil
+        for path, _, _ in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        '''
+        hit / miss counts, estimated time saved [s] and current size [bytes]
+        '''
+        entries = self.entries()
+        return {'hits': self.hits, 'misses': self.misses, 'saved_s': round(self.saved_s, 3),
+                'entries': len(entries), 'bytes': sum(e[1] for e in entries)}
+
+
 def gdal_corners(filename):
     '''
     a function  that can be used to determine the boundary of a raster / tif file.
@@ -57,52 +693,464 @@ def gdal_corners(filename):
     maxy = gt[3]
     return (minx,miny,maxx,maxy)
                 
-def join_files(file_list):
+# column types of SWESARR radiometer CSVs (SNEX20_SWESARR_TB_*.csv). 
+# positions always stay float64: float32 would round longitudes to ~1 meter
+RADIOM_DTYPES = {
+    'UTC': 'str',
+    'Longitude (deg)': 'float64', 'Latitude (deg)': 'float64',
+    'Elevation (m)': 'float64',
+    'TB X (K)': 'float64', 'TB K (K)': 'float64', 'TB Ka (K)': 'float64',
+    'Antenna Longitude (deg)': 'float64', 'Antenna Latitude (deg)': 'float64',
+    'Antenna Altitude (m)': 'float64', 'Antenna Yaw (deg)': 'float64',
+    'Antenna Pitch (deg)': 'float64', 'Antenna Look Angle (deg)': 'float64',
+}
+RADIOM_TIME_FORMAT = '%Y%m%d-%H:%M:%S.%f'
+
+def parse_utc(utc):
+    '''
+    convert SWESARR radiometer time stamps (e.g. 20200211-18:33:53.048360) 
+    to a pandas datetime series in one vectorized call. datetimes pass through.
+    '''
+    import pandas as pd
+
+    utc = pd.Series(utc)
+    if pd.api.types.is_datetime64_any_dtype(utc):
+        return utc
+    return pd.to_datetime(utc, format=RADIOM_TIME_FORMAT)
+
+
+def _radiom_dtypes(float32):
+    # measurement columns may be stored in float32, positions may not
+    dtypes = dict(RADIOM_DTYPES)
+    if float32:
+        for col in dtypes:
+            if col not in ('UTC', 'Longitude (deg)', 'Latitude (deg)',
+                           'Antenna Longitude (deg)', 'Antenna Latitude (deg)'):
+                dtypes[col] = 'float32'
+    return dtypes
+
+
+@profiled
+def read_radiom(filename, float32=False, chunksize=None, cache=True, cache_dir=None):
+    '''
+    read a SWESARR radiometer CSV with a fixed column schema.
+
+    input
+        filename  - path to a SNEX20_SWESARR_TB_*.csv file
+        float32   - store brightness temperatures, elevation and antenna angles as float32
+        chunksize - if given, return an iterator of dataframes with this many rows each
+                    instead of one dataframe (for CSVs larger than memory). no caching.
+        cache     - convert the CSV once to Parquet and memory-map that file on later 
+                    calls. the Parquet file is named after the path, size and mtime of
+                    the CSV, so a changed (or another) CSV of the same name gets its own.
+        cache_dir - where to keep the Parquet file (default: the scratch directory of
+                    get_out_dir, next to the CSV when there is none)
+    output
+        pandas dataframe (or iterator of dataframes) with UTC parsed to datetime64
+    '''
+    import os
+    import pandas as pd
+
+    dtypes = _radiom_dtypes(float32)
+
+    def parse(frame):
+        frame['UTC'] = parse_utc(frame['UTC'])
+        return frame
+
+    def chunks(size):
+        with pd.read_csv(filename, dtype=dtypes, chunksize=size) as reader:
+            for frame in reader:
+                yield parse(frame)
+
+    if chunksize is not None:
+        return chunks(chunksize)
+    if not cache:
+        return parse(pd.read_csv(filename, dtype=dtypes))
+
+    if cache_dir is None:
+        # not next to the CSV by default: that is usually the tracked data/ folder
+        cache_dir = _out_dir_path()[1] or os.path.dirname(os.path.abspath(filename))
+    os.makedirs(cache_dir, exist_ok=True)
+    import hashlib
+    # flight lines can have CSVs of the same name, and the scratch dir is shared
+    stat = os.stat(filename)
+    tag = hashlib.sha256(f'{os.path.abspath(filename)}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    parquet = os.path.join(cache_dir, f"{stem}.{tag}{'.f32' if float32 else ''}.parquet")
+
+    if not os.path.exists(parquet):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # stream the CSV into the Parquet file so the conversion never holds it all in memory
+        tmp = parquet + '.part'
+        writer = None
+        try:
+            for frame in chunks(1_000_000):
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(tmp, parquet)
+
+    return pd.read_parquet(parquet, memory_map=True)
+
+
+# SWESARR SAR tile names, e.g. GRMCT2_31801_20007_016_200211_09225VV_XX_01.tif
+#   site _ line _ flight _ segment _ date (yymmdd) _ frequency (GHz) look angle polarization _ mode _ version
+SWESARR_SAR_NAME = re.compile(
+    r'^(?P<site>[A-Za-z0-9]+)_(?P<line>\d+)_(?P<flight>\d+)_(?P<segment>\d+)_(?P<date>\d{6})_'
+    r'(?P<freq>\d{2})(?P<look>\d{3})(?P<pol>[HV]{2})_(?P<mode>[A-Za-z]+)_(?P<version>\d+)\.(?i:tiff?)$'
+)
+
+def parse_swesarr_name(filename):
+    '''
+    split a SWESARR SAR tile name into its fields.
+
+    input
+        filename - path or name of a SWESARR GeoTIFF 
+    output
+        dictionary of strings with keys site, line, flight, segment, date, freq, 
+        look, pol, mode and version, plus 'band' (e.g. '09VV')
+    '''
+    import os
+
+    match = SWESARR_SAR_NAME.match(os.path.basename(filename))
+    if match is None:
+        raise ValueError(f'{filename} does not look like a SWESARR SAR tile name')
+
+    fields = match.groupdict()
+    fields['band'] = fields['freq'] + fields['pol']
+    return fields
+
+
+def _tile_chunks(block_size, target=1200):
+    # a whole number of internal tiles, as close to the target size as possible
+    return max(1, round(target / block_size)) * block_size
+
+
+@profiled
+def join_files(file_list, target_chunk=1200):
     
     '''
         a method for merging raster/tif data along the band dimension using 
         rioxarray. this method does not save data to storage.
+
+        every file is opened once (header only) and the bands are stacked with
+        a single lazy concatenation. dask chunks are a whole number of the 
+        GeoTIFF's internal tiles, roughly target_chunk pixels on a side.
+
+        band names come from parse_swesarr_name. if a file name is not a
+        SWESARR tile name, the files are stacked in lexical order instead and
+        named like the original notebooks did (with a warning).
     '''
     
+    import os
+    import warnings
     import rioxarray as rxr
     import xarray as xr
-    
-    # initialize band names
-    var_names = []
-    
-    # loop over bands, append to a rasterio xarray
+
+    names = []
     for file in file_list:
-        
-        xmin,ymin,xmax,ymax=tuple(gdal_corners(file))
-        cda=rxr.open_rasterio(file,chunks=(1,1200,1200))
-        cda=cda.sel(x=slice(xmin,xmax),y=slice(ymax,ymin))
-        
-        if file == file_list[0]:
-            da = cda
-        else:
-            da = xr.concat([da, cda], "band")
-            
-        # extract frequency / polarization band
-        var_name = file.split('_')[5]
-        var_name = var_name[0:2] + var_name[5:]
-        var_names.append(var_name)
+        try:
+            names.append(parse_swesarr_name(file)['band'])
+        except ValueError:
+            names = None
+            break
+    if names is None:
+        warnings.warn('not every file is a SWESARR tile name, stacking the bands in lexical order')
+        file_list = sorted(file_list)
+        names = []
+        for file in file_list:
+            # e.g. ..._09225VV_... -> 09VV, the whole stem when there is no such field
+            stem = os.path.splitext(os.path.basename(file))[0]
+            fields = stem.split('_')
+            names.append(fields[5][0:2] + fields[5][5:] if len(fields) > 5 else stem)
+    
+    # loop over bands, opening each file lazily
+    bands = []
+    with stage('open'):
+        for file, name in zip(file_list, names):
+            cda = rxr.open_rasterio(file)
+
+            # align dask chunks with the internal tiling so no tile is read twice
+            block_y = cda.encoding.get('preferred_chunks', {}).get('y', target_chunk)
+            block_x = cda.encoding.get('preferred_chunks', {}).get('x', target_chunk)
+            cda = cda.chunk({'band': 1, 
+                             'y': _tile_chunks(block_y, target_chunk),
+                             'x': _tile_chunks(block_x, target_chunk)})
+
+            # extract frequency / polarization band
+            bands.append(cda.assign_coords({'band': [name]}))
+
+    # stack everything in one go
+    with stage('concat'):
+        return xr.concat(bands, 'band')
+
+
+def nearest_index(axis, values):
+    '''
+    find the index of the closest element of a sorted 1-D coordinate axis 
+    for every value in an array.
+
+    input
+        axis   - sorted 1-D array (ascending or descending, rasters usually store y descending)
+        values - array of coordinates to look up
+    output
+        ind    - integer numpy array, same shape as values
+    '''
+    axis = np.asarray(axis)
+    values = np.asarray(values)
+    if axis.size == 1:
+        return np.zeros(values.shape, dtype=np.intp)
+
+    # searchsorted needs an ascending axis, so flip descending axes and flip the answer back
+    descending = axis[0] > axis[-1]
+    if descending:
+        axis = axis[::-1]
+
+    # index of the first element to the right of each value, then pick the closer neighbor.
+    # ties go to the element that comes first in the original ordering (like list.index(min(...)))
+    right = np.clip(np.searchsorted(axis, values), 1, axis.size - 1)
+    left = right - 1
+    d_left = np.abs(values - axis[left])
+    d_right = np.abs(axis[right] - values)
+    if descending:
+        ind = np.where(d_left < d_right, left, right)
+        ind = axis.size - 1 - ind
+    else:
+        ind = np.where(d_left <= d_right, left, right)
+
+    return ind
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    '''
+    great circle distance [meter] between two sets of latitude/longitude points [deg].
+
+    all arrays are broadcast against each other, so thousands of pairs are handled
+    in one call. the spherical earth model differs from geopy's ellipsoidal distance
+    by less than 0.5%, which is far below a SAR pixel at the distances used here.
+    '''
+    r_earth = 6371008.8 # mean earth radius [meter]
+
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2)**2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * r_earth * np.arcsin(np.sqrt(a))
+
+
+@profiled
+def colocate(lat_sar, lon_sar, lat_rad, lon_rad):
+    '''
+    match radiometer samples to the nearest SAR grid cell.
+
+    input
+        lat_sar, lon_sar - sorted 1-D latitude / longitude axes of the SAR grid [deg]
+        lat_rad, lon_rad - radiometer sample positions [deg]
+    output
+        location_data - pandas dataframe with one row per radiometer sample containing
+                        the SAR and radiometer positions, the SAR row / column indices
+                        and the distance between both centers [meter]
+    '''
+    import pandas as pd
 
-    # change band names for reading
-    da = da.assign_coords({'band' : var_names})
-    return da
+    lat_sar = np.asarray(lat_sar)
+    lon_sar = np.asarray(lon_sar)
+    lat_rad = np.asarray(lat_rad)
+    lon_rad = np.asarray(lon_rad)
 
+    # binary search on the sorted SAR axes instead of scanning them for every sample
+    ind_lat = nearest_index(lat_sar, lat_rad)
+    ind_lon = nearest_index(lon_sar, lon_rad)
 
-def join_sar_radiom(da, radiom):
+    s_lat = lat_sar[ind_lat]
+    s_lon = lon_sar[ind_lon]
+
+    # build the frame in a single step, one column per quantity
+    return pd.DataFrame({'sar_lat': s_lat, 'sar_lon' : s_lon, 
+                         'rad_lat' : lat_rad, 'rad_lon' : lon_rad, 
+                         'ind_lat' : ind_lat, 'ind_lon' : ind_lon,
+                         'dist_m' : haversine(lat_rad, lon_rad, s_lat, s_lon)})
+
+
+@functools.lru_cache(maxsize=None)
+def get_transformer(src_crs, dst_crs):
+    '''
+    cached pyproj Transformer between two coordinate reference systems.
+
+    building a Transformer is far more expensive than using one, so every 
+    (src_crs, dst_crs) pair is only built once per session. axis order is 
+    always (x, y) / (lon, lat).
+    '''
+    from pyproj import Transformer
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+def utm_crs(lon, lat):
+    '''
+    pick the UTM zone covering the center of the data extent.
+
+    input
+        lon, lat - point positions [deg]
+    output
+        CRS string of the WGS 84 / UTM zone, e.g. "EPSG:32612" for zone 12 north
+    '''
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    c_lon = (np.nanmin(lon) + np.nanmax(lon)) / 2
+    c_lat = (np.nanmin(lat) + np.nanmax(lat)) / 2
+
+    # 6 degree wide zones counted eastward from 180 W; 326xx north, 327xx south
+    zone = int((c_lon + 180) // 6) % 60 + 1
+    return f"EPSG:{(32600 if c_lat >= 0 else 32700) + zone}"
+
+
+@profiled
+def locate_in_raster(da, lat, lon):
+    '''
+    match latitude/longitude points to pixels of a projected raster without 
+    reprojecting the raster.
+
+    input
+        da       - rioxarray DataArray with a CRS and an affine transform (e.g. UTM)
+        lat, lon - point positions [deg]
+    output
+        location_data - pandas dataframe with the same columns as colocate(). points 
+                        outside the raster are matched to the closest edge pixel.
+    '''
+    import pandas as pd
+
+    lat = np.asarray(lat)
+    lon = np.asarray(lon)
+
+    # points into the raster's CRS, then into fractional (column, row) through the affine transform
+    x, y = get_transformer("EPSG:4326", da.rio.crs.to_string()).transform(lon, lat)
+    x = np.asarray(x)
+    y = np.asarray(y)
+    col, row = ~da.rio.transform() * (x, y)
+
+    # the pixel containing each point, clipped to the raster edges
+    ind_lon = np.clip(np.floor(col).astype(np.intp), 0, da.sizes['x'] - 1)
+    ind_lat = np.clip(np.floor(row).astype(np.intp), 0, da.sizes['y'] - 1)
+
+    # pixel centers, in meters and in latitude/longitude
+    s_x = da.x.data[ind_lon]
+    s_y = da.y.data[ind_lat]
+    s_lon, s_lat = get_transformer(da.rio.crs.to_string(), "EPSG:4326").transform(s_x, s_y)
+
+    return pd.DataFrame({'sar_lat': s_lat, 'sar_lon' : s_lon, 
+                         'rad_lat' : lat, 'rad_lon' : lon, 
+                         'ind_lat' : ind_lat, 'ind_lon' : ind_lon,
+                         'dist_m' : np.hypot(x - s_x, y - s_y)})
+
+
+@profiled
+def extract_points(sar_data, ind_y, ind_x, as_xarray=False):
+    '''
+    pull the SAR values of many pixels at once using xarray's pointwise 
+    ("vectorized") indexing.
+
+    input
+        sar_data  - xarray.DataArray with dimensions [band, y, x]
+        ind_y     - row index of every point (array-like of int)
+        ind_x     - column index of every point (array-like of int)
+        as_xarray - if True, return the (possibly still lazy) DataArray instead of
+                    computing it. handy for keeping dask arrays lazy downstream.
+    output
+        numpy array of shape (n_points, n_bands), or a DataArray with dims (points, band)
+    '''
+    import xarray as xr
+
+    # indexers sharing the new "points" dimension select (y[i], x[i]) pairs
+    # instead of the outer product of rows and columns
+    ind_y = xr.DataArray(np.asarray(ind_y), dims='points')
+    ind_x = xr.DataArray(np.asarray(ind_x), dims='points')
+    points = sar_data.isel(y=ind_y, x=ind_x).transpose('points', ...)
+
+    if as_xarray:
+        return points
+    # a single compute for every point
+    return np.asarray(points.values)
+
+
+# radiometer channels as named in the CSV, in join_sar_radiom's output and in plot labels
+RADIOM_TB_COLUMNS = ['TB X (K)', 'TB K (K)', 'TB Ka (K)']
+RADIOM_OUT_COLUMNS = ['X-band Rad', 'Ku-band Rad', 'Ka-band Rad']
+RADIOM_PLOT_IDS = ['X-band Rad', 'K-band Rad', 'Ka-band Rad']
+
+@profiled
+def plot_frame(out_data, location_data, kind='long'):
+    '''
+    reshape join_sar_radiom's wide table for plotting every channel on a map.
+
+    input
+        out_data      - wide dataframe from join_sar_radiom (UTC, SAR bands, radiometer channels)
+        location_data - co-location table (sar_lat, sar_lon, rad_lat, rad_lon, ...)
+        kind          - 'long': one row per (sample, channel) with columns Longitude (deg), 
+                        Latitude (deg), Measurements and a categorical ID, ready for 
+                        hvplot's groupby='ID'.
+                        'xarray': a Dataset with a Measurements variable over (sample, ID) 
+                        and the SAR / radiometer positions per sample. no data is repeated.
+    '''
+    import pandas as pd
+
+    values = out_data.drop(columns='UTC')
+    n, n_chan = values.shape
+    n_rad = len(RADIOM_PLOT_IDS)
+    n_sar = n_chan - n_rad
+    ids = list(values.columns[:n_sar]) + RADIOM_PLOT_IDS
+
+    sar_lon = location_data['sar_lon'].to_numpy()
+    sar_lat = location_data['sar_lat'].to_numpy()
+    rad_lon = location_data['rad_lon'].to_numpy()
+    rad_lat = location_data['rad_lat'].to_numpy()
+
+    if kind == 'xarray':
+        import xarray as xr
+
+        return xr.Dataset(
+            {'Measurements': (('sample', 'ID'), values.to_numpy())},
+            coords={'ID': ids, 'UTC': ('sample', out_data['UTC'].to_numpy()),
+                    'sar_lon': ('sample', sar_lon), 'sar_lat': ('sample', sar_lat),
+                    'rad_lon': ('sample', rad_lon), 'rad_lat': ('sample', rad_lat)})
+    if kind != 'long':
+        raise ValueError(f"unknown plot frame kind '{kind}', use 'long' or 'xarray'")
+
+    # channel by channel (MATLAB/*F*ortran order); SAR channels sit at the SAR pixel, 
+    # radiometer channels at the radiometer sample
+    return pd.DataFrame({
+        'Longitude (deg)': np.concatenate([np.tile(sar_lon, n_sar), np.tile(rad_lon, n_rad)]),
+        'Latitude (deg)': np.concatenate([np.tile(sar_lat, n_sar), np.tile(rad_lat, n_rad)]),
+        'Measurements': values.to_numpy().ravel(order='F'),
+        'ID': pd.Categorical.from_codes(np.repeat(np.arange(n_chan), n), categories=ids),
+    })
+
+
+@profiled
+def join_sar_radiom(da, radiom, method='reproject', plot='long'):
     ''' 
     
     input
         da - rioxarray containing SWESARR SAR data. 6 channels expected.
         radiom - pandas array containing radiometer data. 3 channels expected.
+        method - how radiometer samples are matched to SAR pixels.
+                 'reproject' warps the whole raster to latitude/longitude first (default,
+                 the values shown in the tutorial). slow and memory hungry.
+                 'transform' moves the radiometer points into the raster's CRS instead.
+                 much faster, but about half of the samples pick a neighbouring pixel,
+                 so the co-located values differ from 'reproject'.
+        plot - which plotting variable to build: 'long' (pandas, default), 'xarray', 
+               or None to skip it in batch jobs. see plot_frame().
         
     output
         data_p - pandas data series intended for plotting with hvplot's "groupby" feature. 
                 sadly, all measurement data is crammed into a single column, making this 
                 difficult to use outside of hvplot functionality.
+                None when plot=None.
         out_data - pandas data series that is readable. intended for use in student exercise.
         
     TO-DO / IMPROVEMENTS :
@@ -113,136 +1161,231 @@ def join_sar_radiom(da, radiom):
               N-dimensional data rather than 2-dimensional data )
             
     '''
-    import numpy as np
     import pandas as pd
-    import datetime
-    
-    # first, convert the data from the SAR's meter-based, 
-    # universal transverse mercator (UTM) coordinate system
-    # to the radiometer's old-fashioned 
-    # latitude/longitude coordinate system
-    sar_geo = da.rio.reproject("EPSG:4326")
     
-    # get latidue and longitude from SAR data
-    lat_sar = sar_geo.y.data
-    lon_sar = sar_geo.x.data
-
     # radiometer latitude/longitude values as numpy arrays
     lat_rad = radiom['Latitude (deg)'].to_numpy()
     lon_rad = radiom['Longitude (deg)'].to_numpy()
 
-    # loop over latitude and longitude
-    frames = []
-    k = -1
-    for lat, lon in zip(lat_rad, lon_rad):
-        k+=1
-
-        # get the difference between latitude and longitude pairs
-        # for SAR and radiometer data
-        lat_m = np.abs(lat_sar - lat).tolist()
-        lon_m = np.abs(lon_sar - lon).tolist()
-
-        # use python's built-in functions to find minimum index
-        ind_lat = lat_m.index(min(lat_m))
-        ind_lon = lon_m.index(min(lon_m))
-
-        # write sar lat and lon
-        s_lat = lat_sar[ind_lat]
-        s_lon = lon_sar[ind_lon]
-
-        # get distance between the estimated sar and radiometer center positions
-        # using vincenty's formula from the geopy library
-        dis = distance( (lat, lon), (s_lat, s_lon) ).m
-
-        # construct data dictionary
-        data_d = {'sar_lat': s_lat, 'sar_lon' : s_lon, 
-                  'rad_lat' : lat, 'rad_lon' : lon, 
-                  'ind_lat' : ind_lat, 'ind_lon' : ind_lon,
-                  'dist_m' : dis}
-
-        # make a pandas dataframe based on the above data!
-        df = pd.DataFrame(data_d, index = [k])
+    if method == 'reproject':
+        # first, convert the data from the SAR's meter-based, 
+        # universal transverse mercator (UTM) coordinate system
+        # to the radiometer's old-fashioned 
+        # latitude/longitude coordinate system
+        with stage('reproject'):
+            sar_geo = da.rio.reproject("EPSG:4326")
         
-        # throw it in an array for good measure
-        frames.append(df)
+        # get latidue and longitude from SAR data
+        lat_sar = sar_geo.y.data
+        lon_sar = sar_geo.x.data
 
-    # use "list comprehension" syntax to merge the pandas dataframes together
-    location_data = pd.concat( data for data in frames )
-    del frames, df, data_d
-    
-    # now lets store our SAR data based on our filtered results
-    sar_data = []
-
-    for in1, in2 in zip( location_data['sar_lon'].tolist(), location_data['sar_lat'].tolist()):
-        # access the dask array storing our results
-        d = sar_geo.sel( x=in1, y=in2 ).compute().data.tolist()
-        # append to our list
-        sar_data.append(d)
-
-    # convert both arrays array to a numpy array for easy merging
-    data = np.array(sar_data)
-    radiom_d = radiom.iloc[:,4:7].to_numpy()
-
-    # insert the radiometer data to the SAR data as a column vector
-    for i in range(np.size(radiom_d,1)):
-        data = np.insert( data, np.size(data,1), radiom_d[:,i], axis=1 )
-    del radiom_d
-
-    # the following section is for plotting with hvplot while including a label only.
-    #
-    # use list operations paired with pandas series to repeat the lat/lon data
-    lon_ser = pd.Series( location_data['sar_lon'].to_list() * (6)\
-                        + location_data['rad_lon'].to_list() * (3) )
-    lat_ser = pd.Series( location_data['sar_lat'].to_list() * (6)\
-                        + location_data['rad_lat'].to_list() * (3) )
-    
-    # flatten MATLAB/*F*ortran style. (Default flattens as row vectors)
-    data_ser = data.flatten(order='F')
-
-    # get series length, create IDs for plotting
-    # all series have the same length, so this shouldn't matter.
-    sl = len(radiom['TB X (K)'])
-    id_ser = pd.Series(
-        ['09VV SAR']*sl + ['09VH SAR']*sl + ['13VV SAR']*sl + ['13VH SAR']*sl + \
-            ['17VV SAR']*sl + ['17VH SAR']*sl + \
-        ['X-band Rad']*sl + ['K-band Rad']*sl + ['Ka-band Rad']*sl, name="ID"
-         )
+        # match every radiometer sample to its closest SAR row / column at once
+        location_data = colocate(lat_sar, lon_sar, lat_rad, lon_rad)
+    elif method == 'transform':
+        # leave the SAR raster alone and move the (few) radiometer points 
+        # into the raster's own UTM grid instead
+        sar_geo = da
+        location_data = locate_in_raster(da, lat_rad, lon_rad)
+    else:
+        raise ValueError(f"unknown co-location method '{method}', use 'transform' or 'reproject'")
     
-    # the final frame used only for plotting by groups with hvplot
-    frame = {'Longitude (deg)' : lon_ser, 'Latitude (deg)' : lat_ser,
-             'Measurements' : data_ser, 'ID' : id_ser}
-    data_p = pd.DataFrame(frame)
-    
-    # convert swesarr numpy data to dataframe
-    swesarr_df = pd.DataFrame(data = data, 
-                        columns = ["09VV SAR", "09VH SAR", 
-                                   "13VV SAR", "13VH SAR",
-                                   "17VV SAR", "17VH SAR",
-                                   'X-band Rad', 'Ku-band Rad', 
-                                   'Ka-band Rad'])
-    
-    # Convert UTC string to date time array
-    times = radiom.UTC.to_frame()
-    times = times['UTC'].to_list()
-
-    # convert to datetime
-    times = [datetime.datetime.strptime(time_str, '%Y%m%d-%H:%M:%S.%f') for time_str in times]
+    # now lets store our SAR data based on our filtered results.
+    # all samples are pulled in one pointwise read, touching only the chunks that hold them
+    data = extract_points(sar_geo, location_data['ind_lat'], location_data['ind_lon'])
 
-    radiom.UTC = times
+    # one wide table: time, the SAR bands, then the radiometer channels.
+    # columns are handed to pandas as they are, without stacking them into a new array first
+    with stage('out_data'):
+        columns = {'UTC': parse_utc(radiom['UTC']).to_numpy()}
+        for ii, band in enumerate(sar_geo['band'].values):
+            columns[f'{band} SAR'] = data[:, ii]
+        for rad_col, out_col in zip(RADIOM_TB_COLUMNS, RADIOM_OUT_COLUMNS):
+            columns[out_col] = radiom[rad_col].to_numpy()
+        out_data = pd.DataFrame(columns)
 
-    
-    # combine time data with swesarr measurements
-    out_data = pd.concat( [radiom.UTC.to_frame(), swesarr_df], axis=1)
+    # the long table is only built when somebody wants to plot it
+    data_p = plot_frame(out_data, location_data, kind=plot) if plot else None
 
     # return the variable used for plotting and its more user-friendly variant.
     return data_p, out_data
 
+@profiled
+def pit_swe(snow_pits):
+    '''
+    total SWE of every snow pit profile.
+
+    input
+        snow_pits -- DataFrame created from snowexsql LayerMeasurements (density layers)
+    output
+        point_swe -- GeoPandas GeoDataFrame with one row per (site, date) and columns
+                     date, swe, geometry and site_id. sites are listed in the order they 
+                     first appear, dates in order of appearance within each site. 
+                     site ids containing spaces are skipped.
+    '''
+    import geopandas as gpd
+
+    # layer SWE from column arithmetic: density * thickness
+    layer_swe = snow_pits['value'].astype(float) * (snow_pits['depth'] - snow_pits['bottom_depth']) / 100
+
+    layers = gpd.pd.DataFrame({'site_id': snow_pits['site_id'], 'date': snow_pits['date'],
+                               'swe': layer_swe, 'geometry': snow_pits['geom']})
+    layers = layers[layers['site_id'].str.split().str.len() == 1]
+
+    # one pass over all layers: sum the swe of each profile, keep its first location
+    # (iloc[0] like the old loop; 'first' would skip a missing geometry)
+    point_swe = layers.groupby(['site_id', 'date'], sort=False).agg(
+        swe=('swe', 'sum'), geometry=('geometry', lambda s: s.iloc[0])).reset_index()
+
+    # groups come out in order of first appearance; regroup them by site
+    site_rank = {site: i for i, site in enumerate(layers['site_id'].unique())}
+    order = np.argsort(point_swe['site_id'].map(site_rank).to_numpy(), kind='stable')
+    point_swe = point_swe.iloc[order].reset_index(drop=True)
+
+    # keep the pits' CRS so later steps know which UTM zone they are in
+    return gpd.GeoDataFrame(point_swe[['date', 'swe', 'geometry', 'site_id']], geometry='geometry',
+                            crs=getattr(snow_pits, 'crs', None))
+
+
+def coord_range(coord, lo, hi):
+    '''
+    index ranges of a sorted 1-D coordinate covering the closed intervals [lo, hi].
+
+    same pixels as xarray's label slicing, but for many intervals at once. works 
+    for ascending and descending coordinates.
+
+    output
+        start, stop - integer arrays, coord[start:stop] lies within [lo, hi]. 
+                      start == stop for intervals without any pixel.
+    '''
+    coord = np.asarray(coord)
+    if coord.size > 1 and coord[0] > coord[-1]:
+        # flip, search, flip the indices back
+        start, stop = coord_range(coord[::-1], lo, hi)
+        return coord.size - stop, coord.size - start
+
+    start = np.searchsorted(coord, lo, side='left')
+    stop = np.searchsorted(coord, hi, side='right')
+    return start, np.maximum(start, stop)
+
+
+def _box_means_lazy(sar_data, y0, y1, x0, x1, max_pixels=2**24):
+    # dask version of box_means. a summed-area table needs a cumulative sum over the
+    # whole raster, so instead the pixels inside the boxes are gathered with pointwise
+    # indexing, which only reads the chunks that contain boxes. dB -> linear, the box
+    # sums and the NaN checks stay lazy; each batch of points is computed once.
+    import xarray as xr
+
+    n_box = (y1 - y0) * (x1 - x0)
+    wy, wx = int((y1 - y0).max()), int((x1 - x0).max())
+    ny, nx = sar_data.sizes['y'], sar_data.sizes['x']
+    dims = ('point', 'wy', 'wx')
+
+    means = np.full([sar_data.sizes['band'], len(y0)], np.nan)
+    batch = max(1, max_pixels // (wy * wx))
+    for b0 in range(0, len(y0), batch):
+        sl = slice(b0, b0 + batch)
+        # row / column of every pixel of every box, padded to the largest box
+        iy = y0[sl, None] + np.arange(wy)
+        ix = x0[sl, None] + np.arange(wx)
+        inside = (iy < y1[sl, None])[:, :, None] & (ix < x1[sl, None])[:, None, :]
+        shape = inside.shape
+        iy = np.broadcast_to(np.minimum(iy, ny - 1)[:, :, None], shape)
+        ix = np.broadcast_to(np.minimum(ix, nx - 1)[:, None, :], shape)
+
+        window = sar_data.isel(y=xr.DataArray(iy, dims=dims), x=xr.DataArray(ix, dims=dims))
+        lin = np.exp(window.astype(np.float64) * (np.log(10) / 10))
+        # padding pixels count as 0, NaN pixels inside a box make its mean NaN
+        total = lin.where(xr.DataArray(inside, dims=dims), 0).sum(('wy', 'wx'), skipna=False)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means[:, sl] = 10*np.log10(total.transpose('band', 'point').values / n_box[sl])
+
+    means[:, n_box == 0] = np.nan
+    return means
+
+
+@profiled
+def box_means(sar_data, x, y, half_width, lazy=None):
+    '''
+    mean backscatter of a square about many points, averaged in linear power.
+
+    every band is converted from dB to linear power once and turned into a 
+    summed-area table, after which each box mean only takes four lookups. the 
+    cost is O(pixels + points) instead of O(points x box area x bands). only the
+    part of the raster spanned by the boxes is used.
+
+    input
+        sar_data   -- xarray.DataArray containing [band,y,x] SAR data [dB]
+        x, y       -- point coordinates in the CRS of sar_data
+        half_width -- half of the side length of the square [CRS units]
+        lazy       -- keep everything as dask operations and compute only the final 
+                      means, for rasters larger than memory. instead of summed-area 
+                      tables, the pixels in the boxes are gathered from the chunks 
+                      that hold them. default: True when sar_data is dask-backed
+    output
+        means -- numpy array [band, point] in dB. NaN for boxes with no pixels 
+                 or with any NaN pixel.
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    y0, y1 = coord_range(sar_data['y'].values, y - half_width, y + half_width)
+    x0, x1 = coord_range(sar_data['x'].values, x - half_width, x + half_width)
+    n_box = (y1 - y0) * (x1 - x0)
+
+    means = np.full([sar_data.sizes['band'], len(x)], np.nan)
+    if not np.any(n_box > 0):
+        return means
+
+    # crop to the rows / columns the boxes actually cover
+    has = n_box > 0
+    r0, r1 = y0[has].min(), y1[has].max()
+    c0, c1 = x0[has].min(), x1[has].max()
+    sar_data = sar_data.isel(y=slice(r0, r1), x=slice(c0, c1))
+    y0, y1 = np.clip(y0 - r0, 0, r1 - r0), np.clip(y1 - r0, 0, r1 - r0)
+    x0, x1 = np.clip(x0 - c0, 0, c1 - c0), np.clip(x1 - c0, 0, c1 - c0)
+
+    if lazy is None:
+        lazy = sar_data.chunks is not None
+    if lazy:
+        return _box_means_lazy(sar_data, y0, y1, x0, x1)
+
+    def box_sum(table):
+        # sum over [y0, y1) x [x0, x1) from a zero-padded summed-area table
+        return table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+
+    for ii, band in enumerate(sar_data['band'].values):
+        # dB -> linear power, once per band and in place: 10**(a/10) == exp(a * ln(10)/10)
+        lin = np.array(sar_data.sel(band=band).values, dtype=np.float64)
+        lin *= np.log(10) / 10
+        np.exp(lin, out=lin)
+        valid = ~np.isnan(lin)
+        lin[~valid] = 0
+
+        table = np.zeros([lin.shape[0] + 1, lin.shape[1] + 1])
+        np.cumsum(lin, axis=0, out=table[1:, 1:])
+        np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+        total = box_sum(table)
+
+        np.cumsum(valid, axis=0, out=table[1:, 1:])
+        np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+        n_valid = box_sum(table)
+
+        # boxes need at least one pixel and no missing data
+        ok = (n_box > 0) & (n_valid == n_box)
+        with np.errstate(divide='ignore'):
+            means[ii, ok] = 10*np.log10(total[ok] / n_box[ok])
+
+    return means
+
+
+@profiled
 def filt_pit_to_sar(snow_pits, sar_data, box_size):
     
     '''
     input 
         snow_pits -- DataFrame created from snowexsql LayerMeasurements. (UTM CRS)
-        sar_data  -- xarray.DataArray containing [6,y,x] SWESARR data (UTM CRS)
+        sar_data  -- xarray.DataArray containing [6,y,x] SWESARR data (UTM CRS). dask-backed
+                     arrays (e.g. from join_files) stay lazy, so mosaics larger than memory work
         box_size  -- length of the square about each snow pit used for averaging 
                      obtaining an average swesarr backscatter (numeric)
     
@@ -254,76 +1397,22 @@ def filt_pit_to_sar(snow_pits, sar_data, box_size):
     
     # the filtering box will be centered about the swesarr data
     box_size /= 2
-    
-    import numpy as np
-    import geopandas as gpd
-    
-    to_nl = lambda a: 10**(a/10)
-    to_db = lambda a: 10*np.log10(a)
-    
-
-    snow_pits['value'] = snow_pits['value'].astype(float)
-
-    # Calculate SWE
-    swe_lambda = lambda row: row['value'] * (row['depth'] - row['bottom_depth']) / 100
-    snow_pits['swe'] = snow_pits.apply(swe_lambda, axis=1)
 
     # Prepare the data to be a single point by summing the SWE by site and date
-    point_swe = gpd.GeoDataFrame(columns=['date', 'swe', 'geometry', 'site_id'])
-
-    sites = snow_pits['site_id'].unique().tolist()
-
-    my_sites = []
-    # Loop over data by site and date
-    for site in sites:
-        if len(site.split()) == 1:
-            ind1 = snow_pits['site_id'] == site
-            dates = snow_pits['date'][ind1].unique().tolist()
-            
-            for date in dates:
-                # Grab all density at this site and date
-                ind2= snow_pits['date'] == date
-                
-                profile = snow_pits[ind1 & ind2]
-            
-                # sum the swe column and assign data to a dictionary
-                data = gpd.pd.DataFrame ({'swe': profile['swe'].sum(), 'geometry': profile['geom'].iloc[0], 'date': date}, index=[0])
-            
-                # Add the data to a dataframe
-                point_swe = gpd.pd.concat([point_swe, data], ignore_index=True)
-                my_sites.append(site)
-    point_swe['site_id'] = my_sites    
+    point_swe = pit_swe(snow_pits)
 
     # x and y coordinates as numpy arrays
     lat_pit = point_swe['geometry'].y.to_numpy()
     lon_pit = point_swe['geometry'].x.to_numpy()
 
 
-    # get subelements of the primary xarray
-    swesarr_subs = []
-    for cur_lat, cur_lon in zip(lat_pit, lon_pit):
-        # get bounding box about lat / lon
-        lat_box = np.array([cur_lat]) + np.array([-box_size, box_size])
-        lon_box = np.array([cur_lon]) + np.array([-box_size, box_size])
-        
-        # extract points
-        tmp = sar_data.sel(y=slice(lat_box[1], lat_box[0]), x=slice(lon_box[0], lon_box[1]))
-        # add to that thing
-        swesarr_subs.append( tmp )
-        
-    # obtain the mean SAR value for each subelement
-    swesarr_mean = np.zeros([6, len(my_sites)]) * np.nan
-    for sub, ii in zip(swesarr_subs, range(len(my_sites))):
-        for sub_band, jj in zip( sub['band'].values, range(6)):
-            if not any( x == 0 for x in swesarr_subs[ii].shape ) :
-                cur_data = swesarr_subs[ii].sel({'band':sub_band})
-                swesarr_mean[jj,ii] = to_db(np.mean(to_nl(cur_data.values)))
+    # obtain the mean SAR value in the box about each pit, for all pits and bands at once
+    swesarr_mean = box_means(sar_data, lon_pit, lat_pit, box_size)
 
     # filter out any data with nans
     nan_mask = ~np.isnan(swesarr_mean)
     nan_mask = np.logical_and.reduce(nan_mask,axis=0)
     swesarr_mean = swesarr_mean[:,nan_mask]
-    my_sites = [a for a,b in zip(my_sites, nan_mask) if b]
     lat_pit = lat_pit[nan_mask]
     lon_pit = lon_pit[nan_mask]
     point_swe_filt = point_swe[nan_mask]
@@ -333,7 +1422,8 @@ def filt_pit_to_sar(snow_pits, sar_data, box_size):
     
     return point_swe_filt, swesarr_mean
 
-def filt_radiom_points( fp_10m, fp_18m, fp_37m, radiom, point_swe_filt ):
+@profiled
+def filt_radiom_points( fp_10m, fp_18m, fp_37m, radiom, point_swe_filt, average=False, crs=None ):
     '''
 
     Parameters
@@ -348,73 +1438,386 @@ def filt_radiom_points( fp_10m, fp_18m, fp_37m, radiom, point_swe_filt ):
         radiometer data from SWESARR CSV
     point_swe_filt : geopandas GeoDataFrame
         filtered SWE data from call to filt_pit_to_sar()
+    average : bool, optional
+        if True, average every radiometer sample inside each footprint instead of 
+        taking the nearest one. the number of samples is stored in N_X, N_K and N_Ka.
+    crs : str, optional
+        projected CRS of the snow pit positions. defaults to the CRS of point_swe_filt,
+        or the UTM zone of the radiometer data when point_swe_filt has none.
 
     Returns
     -------
     rad_swe : geopandas GeoDataFrame
         Dataframe of SWE snow pit data with nearest brightness temperature value available
     '''
-    from pyproj import Transformer
+    from scipy.spatial import cKDTree
+
     rad_lat = np.array( radiom['Latitude (deg)'])
     rad_lon = np.array( radiom['Longitude (deg)'])
 
-    # Convert latitude and longitude to UTM
-    wgs84_crs = "EPSG:4326"
-    utm_crs   = "EPSG:32612"
-    trnsfmr             = Transformer.from_crs(wgs84_crs, utm_crs)
-    rad_east, rad_north = trnsfmr.transform(rad_lat, rad_lon)
+    # Convert latitude and longitude to the pits' UTM zone
+    if crs is None:
+        crs = getattr(point_swe_filt, 'crs', None)
+        crs = crs.to_string() if crs is not None else utm_crs(rad_lon, rad_lat)
+    with stage('transform'):
+        rad_east, rad_north = get_transformer("EPSG:4326", crs).transform(rad_lon, rad_lat)
     
-    lat_pit = np.array( point_swe_filt['lat'] )
-    lon_pit = np.array( point_swe_filt['lon'] )
-
-    rad_pit10 = np.zeros( [ np.shape( lat_pit )[0]]) * np.nan
-    rad_pit18 = np.zeros( [ np.shape( lat_pit )[0]]) * np.nan
-    rad_pit37 = np.zeros( [ np.shape( lat_pit )[0]]) * np.nan
-    for p_lat, p_lon, i in zip(lat_pit, lon_pit, range(len(radiom))): 
-        dif_arr = np.sqrt( (rad_north - p_lat)**2 + (rad_east - p_lon)**2 )
-        dif_val = np.min(dif_arr)
-        dif_ind = np.argmin(dif_arr)
-        if dif_val <= fp_10m:
-            rad_pit10[i] = radiom['TB X (K)'][dif_ind]
-        if dif_val <= fp_18m:
-            rad_pit18[i] = radiom['TB K (K)'][dif_ind]
-        if dif_val <= fp_37m:
-            rad_pit37[i] = radiom['TB Ka (K)'][dif_ind]
+    # pit positions as (easting, northing) pairs
+    pits = np.column_stack([point_swe_filt['lon'], point_swe_filt['lat']])
+    n_pits = len(pits)
+
+    # spatial index over the radiometer samples, built once
+    with stage('kdtree'):
+        tree = cKDTree(np.column_stack([rad_east, rad_north]))
+
+    footprints = [fp_10m, fp_18m, fp_37m]
+    tb = radiom[['TB X (K)', 'TB K (K)', 'TB Ka (K)']].to_numpy(dtype=float)
+    rad_pit = np.full([n_pits, 3], np.nan)
+
+    if not average:
+        # nearest radiometer sample of every pit in one batched query
+        dif_val, dif_ind = tree.query(pits)
+        for jj, fp in enumerate(footprints):
+            in_fp = dif_val <= fp
+            rad_pit[in_fp, jj] = tb[dif_ind[in_fp], jj]
+    else:
+        counts = np.zeros([n_pits, 3], dtype=int)
+        for jj, fp in enumerate(footprints):
+            # all samples within each footprint, summed per pit with bincount
+            members = tree.query_ball_point(pits, r=fp, return_sorted=False)
+            counts[:, jj] = [len(m) for m in members]
+            if counts[:, jj].sum() == 0:
+                continue
+            flat = np.concatenate([m for m in members if m]).astype(int)
+            pit_of = np.repeat(np.arange(n_pits), counts[:, jj])
+            sums = np.bincount(pit_of, weights=tb[flat, jj], minlength=n_pits)
+            has = counts[:, jj] > 0
+            rad_pit[has, jj] = sums[has] / counts[has, jj]
             
-    nan_mask_rad = ~np.isnan(rad_pit10) # filter about the widest footprint
-    rad_swe = point_swe_filt[nan_mask_rad]
-    rad_swe['TB_X'] = rad_pit10[nan_mask_rad]
-    rad_swe['TB_K'] = rad_pit18[nan_mask_rad]
-    rad_swe['TB_Ka'] = rad_pit37[nan_mask_rad]
+    nan_mask_rad = ~np.isnan(rad_pit[:, 0]) # filter about the widest footprint
+    rad_swe = point_swe_filt[nan_mask_rad].copy()
+    rad_swe['TB_X'] = rad_pit[nan_mask_rad, 0]
+    rad_swe['TB_K'] = rad_pit[nan_mask_rad, 1]
+    rad_swe['TB_Ka'] = rad_pit[nan_mask_rad, 2]
+    if average:
+        rad_swe['N_X'] = counts[nan_mask_rad, 0]
+        rad_swe['N_K'] = counts[nan_mask_rad, 1]
+        rad_swe['N_Ka'] = counts[nan_mask_rad, 2]
     rad_swe = rad_swe.reset_index(drop=True)
     
     return rad_swe
 
-def sar_swe_plot(point_swe_filt, swesarr_mean):
-    s_i = np.argsort(point_swe_filt.swe.to_list())
+# above this many points the plots are rasterized with datashader instead of
+# drawing every glyph; the browser then only gets an image per view
+RASTERIZE_THRESHOLD = 50_000
+# color palette # https://zenodo.org/records/3381072
+OKABE_ITO = ["#000000", "#E69F00", "#56B4E9", "#009E73", "#F0E442", "#0072B2", "#D55E00", "#CC79A7"]
+
+def use_rasterize(n_points, rasterize=None, threshold=RASTERIZE_THRESHOLD):
+    '''
+    rasterize=None picks the large-data mode when there are more than threshold points
+    '''
+    if rasterize is None:
+        return n_points > threshold
+    return bool(rasterize)
+
+class TileCache:
+    '''
+    datashader aggregates of a point table, computed per zoom level and tile.
+
+    zoom levels (zx, zy) split the extent of the data into 2**zx x 2**zy tiles
+    of tile_px x tile_px pixels. a view only aggregates the tiles it needs at
+    the coarsest levels that still give one tile pixel per screen pixel (x and
+    y separately, zooming into a long axis does not refine the other one), and
+    every tile is kept (up to max_tiles, least recently used dropped first),
+    so panning back and forth or zooming out again is not recomputed.
+
+    input
+        frame: pandas dataframe with the points
+        x, y: column names of the coordinates
+        value: column aggregated with agg ('mean', 'max', ...), None counts the points
+        category: column of a categorical; counts per category, shaded with colors
+        colors: {category: color} for the shaded image
     
-    # color palette # https://zenodo.org/records/3381072
-    okabe_ito = ["#000000", "#E69F00", "#56B4E9", "#009E73", "#F0E442", "#0072B2", "#D55E00", "#CC79A7"]
+    example
+        tiles = TileCache(frame, 'x', 'y', value='swe')
+        agg = tiles.aggregate(x_range=(0, 1000), y_range=(0, 500), width=800, height=500)
+        tiles.dynamic(width=800, height=500) # holoviews DynamicMap, re-aggregates on zoom
+    '''
+
+    def __init__(self, frame, x, y, value=None, agg='mean', category=None, colors=None,
+                 tile_px=256, max_tiles=512, max_zoom=16):
+        from collections import OrderedDict
+
+        columns = [x, y] + [c for c in (value, category) if c is not None]
+        frame = frame[columns].dropna(subset=[x, y])
+        if category is not None and frame[category].dtype.name != 'category':
+            frame = frame.astype({category: 'category'})
+        self.frame = frame
+        self.x, self.y = x, y
+        self.value, self.agg, self.category = value, agg, category
+        self.colors = colors
+        self.tile_px = tile_px
+        self.max_tiles = max_tiles
+        self.max_zoom = max_zoom
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+
+        x0, x1 = float(frame[x].min()), float(frame[x].max())
+        y0, y1 = float(frame[y].min()), float(frame[y].max())
+        # a little margin, and some width for a single point / a vertical line
+        pad_x = (x1 - x0) * 1e-3 or 0.5
+        pad_y = (y1 - y0) * 1e-3 or 0.5
+        self.extent = (x0 - pad_x, x1 + pad_x, y0 - pad_y, y1 + pad_y)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _reduction(self):
+        import datashader as ds
+
+        if self.category is not None:
+            return ds.count_cat(self.category)
+        if self.value is None:
+            return ds.count()
+        return getattr(ds, self.agg)(self.value)
+
+    def zoom_level(self, view, full, pixels):
+        '''
+        coarsest zoom level with at least one tile pixel per screen pixel, for
+        a view range of the full extent (lo, hi) drawn on pixels screen pixels
+        '''
+        span = max(view[1] - view[0], 1e-12)
+        tiles_across = (full[1] - full[0]) / span * pixels / self.tile_px
+        return int(min(self.max_zoom, max(0, np.ceil(np.log2(max(tiles_across, 1))))))
+
+    def tile(self, zx, zy, i, j):
+        '''
+        aggregate of tile column i, row j at zoom levels zx, zy (cached)
+        '''
+        import datashader as ds
+
+        key = (zx, zy, i, j)
+        if key in self._tiles:
+            self.hits += 1
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+        self.misses += 1
+
+        x0, x1, y0, y1 = self.extent
+        w = (x1 - x0) / 2**zx
+        h = (y1 - y0) / 2**zy
+        canvas = ds.Canvas(plot_width=self.tile_px, plot_height=self.tile_px,
+                           x_range=(x0 + i * w, x0 + (i + 1) * w),
+                           y_range=(y0 + j * h, y0 + (j + 1) * h))
+        agg = canvas.points(self.frame, self.x, self.y, agg=self._reduction())
+
+        self._tiles[key] = agg
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return agg
+
+    def aggregate(self, x_range=None, y_range=None, width=800, height=500):
+        '''
+        aggregate of the view x_range, y_range, assembled from the cached tiles
+
+        output
+            xarray.DataArray with dims (y, x) (plus the category for category tables)
+        '''
+        import xarray as xr
+
+        x0, x1, y0, y1 = self.extent
+        # clip the view to the data, whole view when the ranges are unknown
+        vx0, vx1 = x_range if x_range is not None and None not in x_range else (x0, x1)
+        vy0, vy1 = y_range if y_range is not None and None not in y_range else (y0, y1)
+        vx0, vx1 = max(vx0, x0), min(vx1, x1)
+        vy0, vy1 = max(vy0, y0), min(vy1, y1)
+        if vx0 >= vx1 or vy0 >= vy1: # nothing of the data in view
+            vx0, vx1, vy0, vy1 = x0, x1, y0, y1
+
+        zx = self.zoom_level((vx0, vx1), (x0, x1), width)
+        zy = self.zoom_level((vy0, vy1), (y0, y1), height)
+        w = (x1 - x0) / 2**zx
+        h = (y1 - y0) / 2**zy
+        cols = range(int((vx0 - x0) // w), min(2**zx, int(np.ceil((vx1 - x0) / w))))
+        rows = range(int((vy0 - y0) // h), min(2**zy, int(np.ceil((vy1 - y0) / h))))
+
+        agg = xr.concat([xr.concat([self.tile(zx, zy, i, j) for i in cols], dim=self.x)
+                         for j in rows], dim=self.y)
+        return agg.sel({self.x: slice(vx0, vx1), self.y: slice(vy0, vy1)})
+
+    def element(self, x_range=None, y_range=None, width=800, height=500):
+        '''
+        holoviews element of a view: an Image of the aggregate, or for
+        category tables an RGB image shaded with the category colors
+        '''
+        import holoviews as hv
+
+        agg = self.aggregate(x_range, y_range, width, height)
+        if self.category is None:
+            vdim = self.value or 'count'
+            return hv.Image(agg.rename(vdim), kdims=[self.x, self.y], vdims=[vdim])
+
+        import datashader.transfer_functions as tf
+
+        img = tf.shade(agg, color_key=self.colors, min_alpha=80)
+        rgba = img.data.view(np.uint8).reshape(img.shape + (4,)) # packed RGBA uint32
+        return hv.RGB((img[self.x].values, img[self.y].values)
+                      + tuple(rgba[..., k] / 255 for k in range(4)),
+                      kdims=[self.x, self.y], vdims=['R', 'G', 'B', 'A'])
+
+    def dynamic(self, width=800, height=500, **opts):
+        '''
+        holoviews DynamicMap that re-aggregates the visible range on pan / zoom
+        '''
+        import holoviews as hv
+
+        def view(x_range, y_range):
+            return self.element(x_range, y_range, width, height)
+
+        dmap = hv.DynamicMap(view, streams=[hv.streams.RangeXY()])
+        return dmap.opts(width=width, height=height, **opts)
+
+    def stats(self):
+        return {'tiles': len(self._tiles), 'hits': self.hits, 'misses': self.misses}
+
+def _web_mercator(frame, x, y, crs):
+    '''
+    copy of frame with x, y reprojected from crs to web mercator (the crs of hv.Tiles)
+    '''
+    frame = frame.copy()
+    if crs != 'EPSG:3857':
+        frame[x], frame[y] = get_transformer(crs, 'EPSG:3857').transform(frame[x].to_numpy(), frame[y].to_numpy())
+    return frame
+
+def _tile_source(tiles):
+    import holoviews as hv
+    from holoviews.element.tiles import tile_sources
+
+    if tiles is None or isinstance(tiles, hv.Tiles):
+        return tiles
+    return tile_sources[tiles]()
+
+@profiled
+def plot_points(frame, x, y, color, by=None, crs='EPSG:4326', tiles='EsriImagery', agg='mean',
+                rasterize=None, threshold=RASTERIZE_THRESHOLD, width=800, height=500, cmap='viridis', **kwargs):
+    '''
+    map of point measurements, rasterized for large tables
+
+    small tables are drawn with hvplot points (one glyph per point, hover info).
+    above threshold points the points are reprojected to web mercator and
+    aggregated with datashader (agg of color per pixel) through TileCache,
+    one cache per value of by, so switching channels or zooming back reuses
+    the tiles already computed.
+
+    input
+        frame: pandas dataframe, e.g. data_p from join_sar_radiom
+        x, y: coordinate columns (in crs)
+        color: column to color / aggregate by
+        by: column to make a widget of (e.g. 'ID', one map per channel)
+        rasterize: True / False to force a mode, None to decide by the point count
+        kwargs: passed on to hvplot (small) or to the image options (large)
+
+    example
+        data_p, out_data = join_sar_radiom(da, radiom, plot='long')
+        plot_points(data_p, 'Longitude (deg)', 'Latitude (deg)', 'Measurements', by='ID')
+    '''
+    if not use_rasterize(len(frame), rasterize, threshold):
+        import hvplot.pandas # noqa: F401, registers the .hvplot accessor
+
+        return frame.hvplot.points(x, y, color=color, groupby=by, geo=True, crs=crs, tiles=tiles,
+                                   width=width, height=height, cmap=cmap, **kwargs)
+
+    import holoviews as hv
+
+    frame = _web_mercator(frame[[x, y, color] + ([by] if by else [])], x, y, crs)
+    opts = dict(cmap=cmap, colorbar=True, tools=['hover'], **kwargs)
+    if by is None:
+        img = TileCache(frame, x, y, value=color, agg=agg).dynamic(width, height, **opts)
+    else:
+        groups = {key: group for key, group in frame.groupby(by, observed=True)}
+        caches = {}
+
+        def view(key, x_range, y_range):
+            if key not in caches:
+                caches[key] = TileCache(groups[key], x, y, value=color, agg=agg)
+            return caches[key].element(x_range, y_range, width, height)
+
+        img = hv.DynamicMap(view, kdims=[by], streams=[hv.streams.RangeXY()])
+        img = img.redim.values(**{by: list(groups)}).opts(width=width, height=height, **opts)
+
+    source = _tile_source(tiles)
+    return img if source is None else source * img
+
+def _rank_frame(swe, values, names):
+    '''
+    long table of SWE rank (pits sorted by SWE), band name and value, for the
+    rasterized versions of the SWE plots
+    '''
+    import pandas as pd
+
+    swe = np.asarray(swe)
+    s_i = np.argsort(swe)
+    rank = np.arange(len(swe))
+    values = np.stack([np.asarray(v)[s_i] for v in values])
+    long = pd.DataFrame({'rank': np.tile(rank, len(names)), 'value': values.ravel(),
+                         'band': pd.Categorical.from_codes(np.repeat(np.arange(len(names)), len(swe)), names)})
+    swe_frame = pd.DataFrame({'rank': rank, 'SWE [mm]': swe[s_i]})
+    return swe_frame, long[~np.isnan(long['value'].to_numpy())]
+
+def _rank_plot(swe_frame, long, names, ylabel, width=800, height=300):
+    '''
+    SWE above the (datashaded) band values, both against the SWE rank of the pit
+    '''
+    colors = dict(zip(names, OKABE_ITO))
+    swe_img = TileCache(swe_frame, 'rank', 'SWE [mm]').dynamic(
+        width, height, cmap=['#d5a6c4', OKABE_ITO[-1]], cnorm='eq_hist', ylabel='SWE [mm]', xaxis=None)
+    band_img = TileCache(long, 'rank', 'value', category='band', colors=colors).dynamic(
+        width, height, xlabel='SnowEx20 Pit (sorted by SWE)', ylabel=ylabel)
+    return (swe_img + band_img).cols(1)
+
+@profiled
+def sar_swe_plot(point_swe_filt, swesarr_mean, rasterize=None, threshold=RASTERIZE_THRESHOLD):
+    '''
+    plot SWE and VV backscatter per pit, sorted by SWE
+
+    with more than threshold points (or rasterize=True) the pits are no
+    longer labeled on a categorical axis: SWE and backscatter are plotted
+    against the SWE rank and rasterized with datashader (see TileCache), and
+    a holoviews layout is returned instead of a matplotlib figure.
+    '''
     sar_labs  = ['09VH', '09VV', '13VH', '13VV', '17VH', '17VV']
+    if use_rasterize(4 * len(point_swe_filt), rasterize, threshold):
+        vv = np.asarray(swesarr_mean)[1:6:2]
+        vv = np.where((vv > -20) & (vv < 0), vv, np.nan)
+        swe_frame, long = _rank_frame(point_swe_filt.swe.to_numpy(), vv, sar_labs[1:6:2])
+        return _rank_plot(swe_frame, long, sar_labs[1:6:2], 'Backscatter [dB]')
+
+    import matplotlib.pyplot as plt
+
+    s_i = np.argsort(point_swe_filt.swe.to_list())
+    
     ## plot avg swe and avg backscatter per site
     fig, ax1 = plt.subplots()
     plt.xticks(rotation=70)
-    ax1.plot( point_swe_filt.site_id[s_i], point_swe_filt.swe[s_i], 'd', linewidth=2, label='SWE', color=okabe_ito[-1] )
-    ax1.set_ylabel('SWE [mm]', color=okabe_ito[-1])
+    ax1.plot( point_swe_filt.site_id[s_i], point_swe_filt.swe[s_i], 'd', linewidth=2, label='SWE', color=OKABE_ITO[-1] )
+    ax1.set_ylabel('SWE [mm]', color=OKABE_ITO[-1])
     ax1.set_xlabel('SnowEx20 Pit ID')
     ax2 = ax1.twinx()
-    for each, lab, pal in zip(swesarr_mean[1:6:2,s_i], sar_labs[1:6:2], okabe_ito):
+    for each, lab, pal in zip(swesarr_mean[1:6:2,s_i], sar_labs[1:6:2], OKABE_ITO):
         sub_data = each
         bl1 = (sub_data > -20) & (sub_data < 0)
         sub_data[~bl1] = np.nan
         xlab = point_swe_filt.site_id[s_i]
         ax2.plot( xlab, sub_data, '-o', label=lab, color=pal )
     plt.legend()
-    ax1.tick_params(axis='y', colors=okabe_ito[-1])
+    ax1.tick_params(axis='y', colors=OKABE_ITO[-1])
     ax2.set_ylabel('Backscatter [dB]')
     return fig
 
-def radiom_swe_plot(rad_swe):
+@profiled
+def radiom_swe_plot(rad_swe, rasterize=None, threshold=RASTERIZE_THRESHOLD):
     '''
     plot SWE and brightness temperature together
 
@@ -422,39 +1825,53 @@ def radiom_swe_plot(rad_swe):
     ----------
     rad_swe : geopandas dataframe
         combined radiometer and swe data
+    rasterize : bool or None
+        rasterize SWE and TB against the SWE rank with datashader; None does
+        so above threshold points
+    threshold : int
+        point count above which rasterize=None switches to datashader
 
     Returns
     -------
-    fig : matplotlib.pyplot.figure
-        figure handle for generated image
+    fig : matplotlib.pyplot.figure or holoviews.Layout
+        figure handle for generated image (a holoviews layout when rasterized)
     '''
-    # color palette # https://zenodo.org/records/3381072
-    okabe_ito = ["#000000", "#E69F00", "#56B4E9", "#009E73", "#F0E442", "#0072B2", "#D55E00", "#CC79A7"]
     TB_ids = ['TB_X', 'TB_K', 'TB_Ka']
     TB_leg = ['X (10)', 'K (18)', 'Ka (37)']
-    
+    if use_rasterize(4 * len(rad_swe), rasterize, threshold):
+        swe_frame, long = _rank_frame(rad_swe.swe.to_numpy(), [rad_swe[lab].to_numpy() for lab in TB_ids], TB_leg)
+        return _rank_plot(swe_frame, long, TB_leg, 'Brightness Temperature [K]')
+
+    import matplotlib.pyplot as plt
+
     s_i = np.argsort(rad_swe.swe.to_list())
     fig, ax1 = plt.subplots()
     plt.xticks(rotation=70)
-    ax1.plot( rad_swe.site_id[s_i], rad_swe.swe[s_i], 'd', linewidth=2, label='SWE', color=okabe_ito[-1] )
-    ax1.set_ylabel('SWE [mm]', color=okabe_ito[-1])
+    ax1.plot( rad_swe.site_id[s_i], rad_swe.swe[s_i], 'd', linewidth=2, label='SWE', color=OKABE_ITO[-1] )
+    ax1.set_ylabel('SWE [mm]', color=OKABE_ITO[-1])
     ax1.set_xlabel('SnowEx20 Pit ID')
     ax2 = ax1.twinx()
-    for lab, pal, leg in zip(TB_ids, okabe_ito, TB_leg):
+    for lab, pal, leg in zip(TB_ids, OKABE_ITO, TB_leg):
         ax2.plot( rad_swe.site_id[s_i], rad_swe[lab][s_i], '-o', label=leg, color=pal )
     plt.legend()
-    ax1.tick_params(axis='y', colors=okabe_ito[-1])
+    ax1.tick_params(axis='y', colors=OKABE_ITO[-1])
     ax2.set_ylabel('Brightness Temperature [K]')
     return fig
 
 
-def rough_radiom_area(radiom, rad_swe, fp_10m, fp_18m, fp_37m):
-    from pyproj import Transformer
+@profiled
+def rough_radiom_area(radiom, rad_swe, fp_10m, fp_18m, fp_37m, rasterize=None, threshold=RASTERIZE_THRESHOLD):
+    '''
+    radiometer footprints of the flight line over the snow pits
+
+    with more than threshold pits (or rasterize=True) the pits are drawn as
+    a datashader image of the mean SWE per pixel (plot_points) instead of one
+    glyph per pit.
+    '''
     import holoviews as hv
+    import hvplot.pandas # noqa: F401, registers the .hvplot accessor
     import pandas as pd
-    import cartopy.crs as ccrs
     
-    crs = ccrs.UTM(zone='12') #12n
     transparent_tile = hv.Tiles('https://server.arcgisonline.com/ArcGIS/rest/services/Reference/World_Reference_Overlay/MapServer/tile/{Z}/{Y}/{X}', name="EsriReference").opts(alpha=0.0)
     
     beg_i = radiom['UTC'].argmin()
@@ -463,10 +1880,9 @@ def rough_radiom_area(radiom, rad_swe, fp_10m, fp_18m, fp_37m):
     end_lats = radiom['Latitude (deg)'][[beg_i, end_i]].to_list()
     end_lons = radiom['Longitude (deg)'][[beg_i, end_i]].to_list()
 
-    wgs84_crs = "EPSG:4326"
-    utm_crs   = "EPSG:32612"
-    trnsfmr             = Transformer.from_crs(wgs84_crs, utm_crs)
-    end_east, end_north = trnsfmr.transform(end_lats, end_lons)
+    # UTM zone of the flight line
+    rad_crs = utm_crs(radiom['Longitude (deg)'], radiom['Latitude (deg)'])
+    end_east, end_north = get_transformer("EPSG:4326", rad_crs).transform(end_lons, end_lats)
 
     xd = {}
     for a, b in zip( [fp_10m, fp_18m, fp_37m], ['10', '18', '37']):
@@ -474,6 +1890,17 @@ def rough_radiom_area(radiom, rad_swe, fp_10m, fp_18m, fp_37m):
         xd['y_' + b] = np.array( [ end_north[0] + a, end_north[1] - a, end_north[1] - a, end_north[0] + a, end_north[0] + a] )
 
 
+    if use_rasterize(len(rad_swe), rasterize, threshold):
+        # everything in web mercator, the crs of the tiles and of the rasterized pits
+        to_merc = get_transformer(rad_crs, 'EPSG:3857')
+        rects = hv.Overlay([
+            hv.Polygons([dict(zip(('x', 'y'), to_merc.transform(xd['x_' + b], xd['y_' + b])))]).opts(
+                color=a, alpha=0.25, line_width=0)
+            for a, b in zip(['blue', 'orange', 'purple'], ['10', '18', '37'])])
+        pits = plot_points(rad_swe, 'lon', 'lat', 'swe', crs=rad_crs, tiles=None, rasterize=True,
+                           cmap='Reds', width=800, height=500)
+        return _tile_source('EsriImagery') * rects * pits
+
     # Overlay the plot with tiles and rectangle
     xd_pd = pd.DataFrame(xd)
 
@@ -487,14 +1914,14 @@ def rough_radiom_area(radiom, rad_swe, fp_10m, fp_18m, fp_37m):
                 alpha=0.25, 
                 line_width=0,
                 geo=True,
-                crs=utm_crs,
+                crs=rad_crs,
                 tiles=c
             )
             )
 
 
     snow_pit_img = rad_swe.hvplot.points('lon', 'lat',  geo=True, color='swe', alpha=1,
-                            tiles=transparent_tile, height=500, width=800, crs=utm_crs, hover_cols=['site_id'],
+                            tiles=transparent_tile, height=500, width=800, crs=rad_crs, hover_cols=['site_id'],
                             cmap='Reds')
     
     final_img = rect_data[0]*rect_data[1]*rect_data[2]*snow_pit_img
@@ -0,0 +1,356 @@
+# incremental Jupyter Book build
+# usage: python build_book.py [--book ../book] [--workers N] [--sphinx-jobs N|auto] [--force] [--dry-run]
+# called by build_resources.sh script
+#
+# Sphinx only re-reads pages whose source is newer than its saved environment,
+# and jupyter-cache only re-executes notebooks whose code changed. Neither
+# knows about the local modules a notebook imports (swesarr/util/helper.py,
+# NN_with_Pytorch/utils.py, ...), and a fresh git checkout makes every page
+# look new. This script
+#   1. hashes every page of _toc.yml together with the local modules it imports
+#   2. compares the hashes with the last successful build (book/_build/.page_inputs.json)
+#   3. syncs the book into a mirror (book/_build/.source): stale pages are
+#      copied / touched there, unchanged ones keep the mtime of their last
+#      build. the files of book/ itself are never modified
+#   4. executes the stale notebooks into jupyter-cache on a process pool
+#   5. renders the mirror with sphinx-build -j (only the stale pages are read)
+#   6. prints the execution and rendering time per page (sphinx.ext.duration)
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+
+import yaml
+
+MANIFEST = '.page_inputs.json'
+MIRROR = '.source'
+SUFFIXES = ('.ipynb', '.md', '.rst')
+# bump when the hashing changes
+MANIFEST_VERSION = 2
+# written into the mirror by jupyter-book config sphinx, not part of the book
+GENERATED = {'conf.py'}
+
+
+def toc_pages(book):
+    '''
+    Source files of every page listed in _toc.yml (url entries are skipped).
+    '''
+    with open(book / '_toc.yml') as f:
+        toc = yaml.safe_load(f)
+
+    files = [toc['root']]
+
+    def walk(entries):
+        for entry in entries or []:
+            if 'file' in entry:
+                files.append(entry['file'])
+            walk(entry.get('chapters'))
+            walk(entry.get('sections'))
+            for part in entry.get('parts') or []:
+                walk(part.get('chapters'))
+
+    walk(toc.get('chapters'))
+    for part in toc.get('parts') or []:
+        walk(part.get('chapters'))
+
+    pages = []
+    for name in files:
+        path = book / name
+        if path.suffix not in SUFFIXES:
+            path = next((path.with_name(path.name + s) for s in SUFFIXES
+                         if path.with_name(path.name + s).exists()), path)
+        if path.exists():
+            pages.append(path)
+    return pages
+
+
+def _code_cells(path):
+    '''
+    Python source of a page: the code cells of a notebook, the {code-cell}
+    blocks of a MyST markdown file.
+    '''
+    if path.suffix == '.ipynb':
+        with open(path, encoding='utf-8') as f:
+            nb = json.load(f)
+        return [''.join(cell['source']) for cell in nb.get('cells', [])
+                if cell.get('cell_type') == 'code']
+    text = path.read_text(encoding='utf-8')
+    return re.findall(r'```\{code-cell\}[^\n]*\n(.*?)```', text, flags=re.S)
+
+
+def _imported_names(source):
+    '''
+    Top-level module names imported by a piece of Python / IPython code.
+    '''
+    # IPython magics and shell escapes are not Python
+    lines = ['' if line.lstrip().startswith(('%', '!')) else line for line in source.splitlines()]
+    try:
+        tree = ast.parse('\n'.join(lines))
+    except SyntaxError:
+        return set(re.findall(r'^\s*(?:from|import)\s+([\w.]+)', source, flags=re.M))
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+    return names
+
+
+def _resolve(name, search_dirs):
+    '''
+    Local file of a module name, or None for installed packages.
+    '''
+    parts = name.split('.')
+    for directory in search_dirs:
+        for candidate in (directory.joinpath(*parts).with_suffix('.py'),
+                          directory.joinpath(*parts, '__init__.py')):
+            if candidate.is_file():
+                return candidate
+    return None
+
+
+def local_dependencies(page):
+    '''
+    Local modules a page imports, followed recursively.
+
+    Modules are looked up in the page's directory and its direct
+    sub-directories (the tutorials add e.g. util/ to sys.path).
+    '''
+    page_dir = page.parent
+    search_dirs = [page_dir] + sorted(d for d in page_dir.iterdir()
+                                      if d.is_dir() and not d.name.startswith(('.', '_')))
+    todo = list(_imported_names('\n'.join(_code_cells(page))))
+    deps = set()
+    while todo:
+        module = _resolve(todo.pop(), search_dirs)
+        if module is None or module in deps:
+            continue
+        deps.add(module)
+        todo += _imported_names(module.read_text(encoding='utf-8'))
+        if module.parent not in search_dirs:
+            search_dirs.append(module.parent)
+    return sorted(deps)
+
+
+def _sha256(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def page_inputs(book, pages):
+    '''
+    Hash of each page's own source and of its local modules.
+    '''
+    inputs = {}
+    for page in pages:
+        deps = local_dependencies(page)
+        inputs[page.relative_to(book).as_posix()] = {
+            'source': _sha256(page),
+            'deps': {d.relative_to(book).as_posix(): _sha256(d) for d in deps},
+        }
+    return inputs
+
+
+def sync_mirror(book, mirror, stale):
+    '''
+    Make mirror a copy of book (without _build), changing as few mtimes as possible.
+
+    Stale pages are always copied (a new mtime, so Sphinx reads them again).
+    Other files are only copied when their content differs, keeping the mtime
+    of the copy, so a fresh checkout of book/ does not make Sphinx read them
+    (or the pages depending on them) again. Files gone from book/ are removed.
+    '''
+    stale = set(stale)
+    seen = set()
+    for root, dirs, files in os.walk(book):
+        root = Path(root)
+        dirs[:] = [d for d in dirs if d != '.ipynb_checkpoints'
+                   and not (root == book and d == '_build')]
+        for name in files:
+            src = root / name
+            dst = mirror / src.relative_to(book)
+            seen.add(dst)
+            if src in stale or not dst.exists():
+                pass
+            elif src.stat().st_size == dst.stat().st_size and (
+                    src.stat().st_mtime_ns == dst.stat().st_mtime_ns or _sha256(src) == _sha256(dst)):
+                continue
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(src, dst)
+
+    for root, dirs, files in os.walk(mirror, topdown=False):
+        root = Path(root)
+        for name in files:
+            path = root / name
+            if path not in seen and not (root == mirror and name in GENERATED):
+                path.unlink()
+        if root != mirror and not any(root.iterdir()):
+            root.rmdir()
+
+
+def reading_durations(doctrees):
+    '''
+    Seconds Sphinx spent reading each page, as recorded by sphinx.ext.duration
+    in the pickled environment ({} when not available).
+    '''
+    import pickle
+
+    try:
+        with open(doctrees / 'environment.pickle', 'rb') as f:
+            env = pickle.load(f)
+        return dict(env.domaindata['duration']['reading_durations'])
+    except Exception: # no sphinx, no environment or no duration extension
+        return {}
+
+
+def load_manifest(path, config_hash):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # a different config / toc means Sphinx rebuilds everything anyway
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('config') != config_hash:
+        return {}
+    return manifest.get('pages', {})
+
+
+def execute_notebooks(book, notebooks, stale_deps, config, workers):
+    '''
+    Execute notebooks into the jupyter-cache used by jupyter-book.
+
+    Cache records of notebooks whose imported modules changed are removed
+    first (their code, and so their cache key, did not change). Returns the
+    execution time in seconds per notebook.
+    '''
+    from jupyter_cache import get_cache
+    from jupyter_cache.executors import load_executor
+
+    execute = config.get('execute') or {}
+    cache = get_cache(str(book / '_build' / '.jupyter_cache'))
+    pks = []
+    for notebook in notebooks:
+        if notebook in stale_deps:
+            try:
+                cache.remove_cache(cache.match_cache_file(str(notebook)).pk)
+            except KeyError: # never executed
+                pass
+        pks.append(cache.add_nb_to_project(str(notebook)).pk)
+
+    executor = load_executor('local-parallel', cache=cache)
+    executor.run_and_cache(filter_pks=pks, timeout=execute.get('timeout', 30),
+                           allow_errors=execute.get('allow_errors', False), n_proc=workers)
+
+    seconds = {}
+    for notebook in notebooks:
+        try:
+            record = cache.match_cache_file(str(notebook))
+            seconds[notebook] = (record.data or {}).get('execution_seconds')
+        except KeyError: # failed; jupyter-book will report it
+            seconds[notebook] = None
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental Jupyter Book build')
+    parser.add_argument('--book', default=str(Path(__file__).resolve().parent.parent / 'book'))
+    parser.add_argument('--workers', type=int, default=None,
+                        help='notebooks executed in parallel (default: number of CPUs)')
+    parser.add_argument('--sphinx-jobs', default='auto',
+                        help="parallel sphinx-build processes (N or 'auto', the default)")
+    parser.add_argument('--force', action='store_true', help='rebuild every page')
+    parser.add_argument('--dry-run', action='store_true', help='only list the stale pages')
+    args = parser.parse_args()
+
+    book = Path(args.book).resolve()
+    build = book / '_build'
+    mirror = build / MIRROR
+    with open(book / '_config.yml') as f:
+        config = yaml.safe_load(f)
+    config_hash = hashlib.sha256((book / '_config.yml').read_bytes()
+                                 + (book / '_toc.yml').read_bytes()).hexdigest()
+    manifest_path = build / MANIFEST
+
+    t0 = time.perf_counter()
+    pages = toc_pages(book)
+    inputs = page_inputs(book, pages)
+    previous = {} if args.force else load_manifest(manifest_path, config_hash)
+    print(f'hashed {len(pages)} pages in {time.perf_counter() - t0:.2f} s')
+
+    stale, stale_deps = [], set()
+    for page in pages:
+        name = page.relative_to(book).as_posix()
+        old = previous.get(name)
+        if old is None or old['source'] != inputs[name]['source']:
+            stale.append(page)
+        elif old['deps'] != inputs[name]['deps']:
+            stale.append(page)
+            stale_deps.add(page)
+
+    print(f'{len(stale)} of {len(pages)} pages to rebuild')
+    for page in stale:
+        print(f"  {page.relative_to(book)}{' (imported modules changed)' if page in stale_deps else ''}")
+    if args.dry_run:
+        return
+
+    t0 = time.perf_counter()
+    sync_mirror(book, mirror, stale)
+    print(f'synced {mirror} in {time.perf_counter() - t0:.2f} s')
+    # mirror copies of the stale pages
+    shadow = {page: mirror / page.relative_to(book) for page in stale}
+
+    execute = config.get('execute') or {}
+    excluded = execute.get('exclude_patterns') or []
+    notebooks = [page for page in stale if page.suffix == '.ipynb'
+                 and not any(fnmatch(page.relative_to(book).as_posix(), p) or fnmatch(page.name, p)
+                             for p in excluded)]
+    seconds = {}
+    if notebooks and execute.get('execute_notebooks', 'auto') == 'cache':
+        t0 = time.perf_counter()
+        executed = execute_notebooks(book, [shadow[nb] for nb in notebooks],
+                                     {shadow[nb] for nb in stale_deps if nb in shadow}, config, args.workers)
+        seconds = {nb: executed[shadow[nb]] for nb in notebooks}
+        print(f'executed {len(notebooks)} notebooks in {time.perf_counter() - t0:.1f} s')
+
+    t0 = time.perf_counter()
+    # conf.py goes into the mirror; same doctrees / html / jupyter-cache as jupyter-book build
+    subprocess.run(['jupyter-book', 'config', 'sphinx', str(mirror)], check=True)
+    command = ['sphinx-build', '-j', str(args.sphinx_jobs), '-b', 'html', '--keep-going', '-W',
+               '-d', str(build / '.doctrees'),
+               '-D', f'nb_execution_cache_path={build / ".jupyter_cache"}',
+               str(mirror), str(build / 'html')]
+    result = subprocess.run(command)
+    render = time.perf_counter() - t0
+    reading = reading_durations(build / '.doctrees')
+
+    def cell(t):
+        return '-' if t is None else f'{t:.1f}'
+
+    # sphinx docnames are the paths without suffix
+    rendered = {page: reading.get(page.relative_to(book).with_suffix('').as_posix()) for page in stale}
+    print(f'\n{"execute":>8} {"render":>8}  page  (seconds)')
+    for page in sorted(stale, key=lambda p: (seconds.get(p) or 0) + (rendered[p] or 0), reverse=True):
+        print(f'{cell(seconds.get(page)):>8} {cell(rendered[page]):>8}  {page.relative_to(book)}')
+    print(f'rendered {len(stale)} pages in {render:.1f} s (sphinx-build -j {args.sphinx_jobs}; '
+          'render = reading time, writing the HTML is only in the total)')
+
+    if result.returncode != 0:
+        sys.exit(result.returncode)
+
+    # only a successful build is remembered
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'config': config_hash, 'pages': inputs}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# builds cookiecutter.json from cookiecutter.yaml in one step:
+#   1. merges team/header.yaml and the per-person team/*.yaml files into team/team.yaml
+#   2. resolves the !include directives of cookiecutter.yaml
+#   3. writes cookiecutter.json, but only if its content changed
+# usage: python build_config.py [<yaml_input_filename> <json_output_filename>]
+# called by build_resources.sh script (replaces build_team_yaml.sh + yaml2json.py)
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import yaml
+
+from yaml_tools import Loader, SafeLoader, cache_yaml, load_yaml
+
+# files in the team folder that are not a person
+TEAM_SKIP = {'team.yaml', 'team_people.yaml', 'template.yaml', 'header.yaml'}
+
+
+def write_if_changed(filename, text):
+    '''
+    Write text to filename unless the file already holds exactly that text.
+    Returns True when the file was written.
+    '''
+    try:
+        with open(filename, 'r') as f:
+            if f.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp = f'{filename}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, filename)
+    return True
+
+
+def build_team(team_dir):
+    '''
+    Merge the header and every person file of the team folder.
+
+    Each person file holds a list with one (or more) people; they are
+    appended to the header's people list in file name order.
+    '''
+    team_dir = Path(team_dir)
+    team = dict(load_yaml(team_dir / 'header.yaml', SafeLoader) or {})
+    people = list(team.get('people') or [])
+
+    person_files = sorted(path for path in team_dir.rglob('*.yaml') if path.name not in TEAM_SKIP)
+    for path in person_files:
+        person = load_yaml(path, SafeLoader)
+        if person is None:
+            continue
+        if not isinstance(person, list):
+            raise ValueError(f'{path}: expected a list of people (see template.yaml)')
+        people += person
+
+    team['people'] = people
+    return team
+
+
+def build_config(yaml_file, json_file):
+    team_dir = Path(yaml_file).parent / 'team'
+    team = build_team(team_dir)
+
+    # team.yaml is still written for anyone using it directly; its parsed
+    # content goes straight into the include cache
+    team_file = team_dir / 'team.yaml'
+    write_if_changed(team_file, yaml.safe_dump(team, sort_keys=False, allow_unicode=True))
+    cache_yaml(team_file, team)
+    print('Team.yaml created')
+
+    with open(yaml_file, 'r') as yaml_in:
+        yaml_object = yaml.load(yaml_in, Loader=Loader)
+
+    if write_if_changed(json_file, json.dumps(yaml_object)):
+        print(f'Wrote {json_file}')
+    else:
+        print(f'{json_file} is up to date')
+
+
+if __name__ == '__main__':
+    yaml_file = sys.argv[1] if len(sys.argv) > 1 else '../cookiecutter.yaml'
+    json_file = sys.argv[2] if len(sys.argv) > 2 else '../cookiecutter.json'
+    build_config(yaml_file, json_file)
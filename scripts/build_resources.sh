@@ -4,16 +4,10 @@ cd "${BASH_SOURCE%/*}/" || exit
 JSON_FILE=../cookiecutter.json
 YAML_FILE=../cookiecutter.yaml
 
-if [ -f "$JSON_FILE" ]; then
-   rm "$JSON_FILE"
-   echo "Removed JSON file"
-fi
-
-./build_team_yaml.sh
-
 if [ -f "$YAML_FILE" ]; then
-   echo "Converting yaml to json"
-   python yaml2json.py "$YAML_FILE" "$JSON_FILE"
+   echo "Building cookiecutter json"
+   # merges the team files and only rewrites the json when it changed
+   python build_config.py "$YAML_FILE" "$JSON_FILE"
 fi
 
 if [ -d "../book/_build/html/assets" ]; then
@@ -37,7 +31,7 @@ check_success() {
 # check_success
 
 echo "Building the Jupyter Book"
-cd ../
-jupyter-book build book/ --warningiserror --keep-going
+# only pages whose source or imported local modules changed are re-executed / re-rendered
+python build_book.py --book ../book
 
 check_success
@@ -2,12 +2,46 @@ import glob
 import os
 import yaml
 
+# libyaml's C loader is much faster; fall back to the pure Python one
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# parsed include files: absolute path -> (mtime_ns, size, parsed content)
+_include_cache = {}
+
+
+def load_yaml(filename, loader=None):
+    '''
+    Parse a yaml file once per modification: a file included several times
+    (or by several builds in one process) is only read again when its mtime
+    or size changed.
+    '''
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    cached = _include_cache.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    with open(path, 'r') as f:
+        result = yaml.load(f, loader or Loader)
+    _include_cache[path] = (stat.st_mtime_ns, stat.st_size, result)
+    return result
+
+
+def cache_yaml(filename, content):
+    '''
+    Store already built content for a file (e.g. one we just wrote), so an
+    !include of it does not parse it again.
+    '''
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    _include_cache[path] = (stat.st_mtime_ns, stat.st_size, content)
+
 
 # Create include directive for yaml file
 # From: https://stackoverflow.com/questions/528281/how-can-i-include-a-yaml-file-inside-another
 # Base code taken from below link :-
 # Ref:https://stackoverflow.com/a/9577670
-class Loader(yaml.SafeLoader):
+class Loader(SafeLoader):
 
     def __init__(self, stream):
 
@@ -21,14 +55,14 @@ class Loader(yaml.SafeLoader):
 
         # Below section is modified for supporting UNIX wildcard patterns
         filenames = glob.glob(filename)
-        
-        # Just to ensure the order of files considered are predictable 
+
+        # Just to ensure the order of files considered are predictable
         # and easy to debug in case of errors.
         filenames.sort()
         for file in filenames:
-            with open(file, 'r') as f:
-                result = yaml.load(f, Loader)
+            result = load_yaml(file, type(self))
 
+            # merge into new containers, the cached results are shared
             if isinstance(result, list):
                 if not isinstance(consolidated_result, list):
                     consolidated_result = []
@@ -41,3 +75,6 @@ class Loader(yaml.SafeLoader):
                 consolidated_result = result
 
         return consolidated_result
+
+
+Loader.add_constructor('!include', Loader.include)